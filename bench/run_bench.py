@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+#
+# QA HOT PATH BENCHMARKS
+# Reproducible timings for the code paths that run all day on a unit:
+#   upload   - upload_log_file against the local backend stand-in, 10 KB to 50 MB
+#   burn     - burn_test.py write_sample (row, flush and both rollups) over
+#              a 4 hour run at several sample rates
+#   graph    - graph.py load_log + render (full and LTTB-decimated) on
+#              synthetic 4 h and 24 h logs
+#   spawn    - run_script_with_logging overhead on a do-nothing script
+#
+# Results go to bench/results/<timestamp>.json. Compare two runs and flag
+# regressions (exit 1 if any):
+#   python3 bench/run_bench.py
+#   python3 bench/run_bench.py --only upload,spawn --baseline bench/results/<old>.json
+#   python3 bench/run_bench.py compare bench/results/<old>.json bench/results/<new>.json
+#
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+SRC_DIR = os.path.join(REPO_DIR, 'src')
+SIM_DIR = os.path.join(REPO_DIR, 'sim')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+TELEMETRY_CSV = os.path.join(REPO_DIR, 'THERMALTEST', 'benchmarks', 'benchmark_log_2025-05-08_22-46-09.csv')
+
+UPLOAD_SIZES = [10_000, 100_000, 1_000_000, 10_000_000, 50_000_000]
+SAMPLE_RATES = [0.2, 1, 10]  # Hz; 0.2 is today's LOG_INTERVAL of 5 s
+GRAPH_HOURS = [4, 24]
+GRAPH_MAX_POINTS = 2000  # graph.py --batch default
+MIN_REGRESSION_S = 0.001
+
+# The fake jtop lets burn_test.py import off-device, the stubs give us a sudo
+sys.path.insert(0, SIM_DIR)
+sys.path.insert(0, os.path.join(SIM_DIR, 'pylib'))
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, REPO_DIR)
+
+# Time the upload path, not main.py's upload gate throttle (set before any bench imports main)
+os.environ['QA_UPLOAD_KBPS'] = '0'
+
+def timeit(func, repeats):
+    """Run func repeats times; returns the list of wall times"""
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+def summarise(runs, **extra):
+    result = {
+        'median_s': statistics.median(runs),
+        'min_s': min(runs),
+        'max_s': max(runs),
+        'runs': len(runs),
+    }
+    result.update(extra)
+    return result
+
+def bench_upload(args, workdir):
+    from backend import start_backend
+    server, url = start_backend()
+    os.environ['QA_BACKEND_URL'] = url
+    os.environ['QA_LOG_DIR'] = workdir
+    import main
+
+    results = {}
+    line = b"[2025-05-13 03:21:52] \xe2\x9c\x93 Chunk 7 verified (Write speed: 1532.40 MB/s)\n"
+    for size in UPLOAD_SIZES:
+        path = os.path.join(workdir, 'bench_upload.txt')
+        with open(path, 'wb') as f:
+            f.write((line * (size // len(line) + 1))[:size])
+        repeats = args.repeats if size <= 1_000_000 else max(3, args.repeats // 3)
+
+        def upload():
+            with contextlib.redirect_stdout(io.StringIO()):
+                if not main.upload_log_file('bench_upload.txt', 'ledTestFile', 1):
+                    raise RuntimeError("upload failed")
+
+        runs = timeit(upload, repeats)
+        results[f"upload_{size // 1000}kb"] = summarise(
+            runs, bytes=size, mb_per_s=size / statistics.median(runs) / 1e6
+        )
+    server.shutdown()
+    return results
+
+def bench_burn(args, workdir):
+    import burn_test
+    from jtop import load_samples
+    from rollup import open_rollups
+
+    samples = [stats for _, stats in load_samples(TELEMETRY_CSV)]
+    results = {}
+    for rate in SAMPLE_RATES:
+        count = int(4 * 3600 * rate)
+        path = os.path.join(workdir, 'burn_test.csv')
+
+        def loop():
+            rollups = open_rollups(workdir, burn_test.FIELDNAMES[2:])
+            try:
+                with open(path, mode='w', newline='') as csvfile:
+                    writer = csv.DictWriter(csvfile, fieldnames=burn_test.FIELDNAMES)
+                    writer.writeheader()
+                    for i in range(count):
+                        burn_test.write_sample(writer, csvfile, samples[i % len(samples)], i * 2 // count, rollups)
+            finally:
+                for rollup in rollups:
+                    rollup.close()
+
+        runs = timeit(loop, max(1, args.repeats // 3))
+        per_sample = statistics.median(runs) / count
+        results[f"burn_loop_{rate:g}hz"] = summarise(
+            runs, samples=count, per_sample_us=per_sample * 1e6,
+            cpu_fraction=per_sample * rate, csv_bytes=os.path.getsize(path)
+        )
+    return results
+
+def synthetic_log(path, hours):
+    """Tile a real burn log at 5 s spacing out to the given length"""
+    with open(TELEMETRY_CSV, newline='') as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        rows = list(reader)
+    count = int(hours * 3600 / 5)
+    start = datetime(2025, 5, 8, 22, 46, 9)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for i in range(count):
+            row = dict(rows[i % len(rows)])
+            row['time'] = (start + timedelta(seconds=5 * i)).strftime("%Y-%m-%d %H:%M:%S")
+            row['stage'] = 0 if i < count // 2 else 1
+            writer.writerow(row)
+    return count
+
+def bench_graph(args, workdir):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import graph
+
+    results = {}
+    for hours in GRAPH_HOURS:
+        csv_path = os.path.join(workdir, f'synthetic_{hours}h.csv')
+        rows = synthetic_log(csv_path, hours)
+        out_png = os.path.join(workdir, f'synthetic_{hours}h.png')
+        repeats = max(1, args.repeats // 3)
+
+        load_runs = timeit(lambda: graph.load_log(csv_path), repeats)
+        df = graph.load_log(csv_path)
+
+        def render():
+            plt.close(graph.render(df, out_png))
+
+        def render_decimated():
+            plt.close(graph.render(df, out_png, max_points=GRAPH_MAX_POINTS))
+
+        render_runs = timeit(render, repeats)
+        decimated_runs = timeit(render_decimated, repeats)
+        results[f"graph_load_{hours}h"] = summarise(load_runs, rows=rows)
+        results[f"graph_render_{hours}h"] = summarise(render_runs, rows=rows)
+        results[f"graph_render_{hours}h_lttb"] = summarise(decimated_runs, rows=rows)
+    return results
+
+def bench_spawn(args, workdir):
+    os.environ['QA_LOG_DIR'] = workdir
+    # Use the pass-through sudo stub when we can't (or shouldn't) sudo for real
+    if shutil.which('sudo') is None or os.geteuid() != 0:
+        os.environ['PATH'] = os.path.join(SIM_DIR, 'stubs') + os.pathsep + os.environ['PATH']
+    import main
+
+    scripts = {
+        'bash': ('noop.sh', "exit 0\n"),
+        'python': ('noop.py', "pass\n"),
+    }
+    results = {}
+    for script_type, (name, body) in scripts.items():
+        path = os.path.join(workdir, name)
+        with open(path, 'w') as f:
+            f.write(body)
+
+        def spawn():
+            with contextlib.redirect_stdout(io.StringIO()):
+                if not main.run_script_with_logging(path, f'{name}.log', script_type=script_type):
+                    raise RuntimeError(f"{name} failed")
+
+        def bare():
+            subprocess.run([script_type if script_type == 'bash' else 'python3', path], check=True)
+
+        runs = timeit(spawn, args.repeats)
+        bare_runs = timeit(bare, args.repeats)
+        results[f"spawn_{script_type}"] = summarise(
+            runs, bare_median_s=statistics.median(bare_runs),
+            overhead_s=statistics.median(runs) - statistics.median(bare_runs)
+        )
+    return results
+
+CASES = {
+    'upload': bench_upload,
+    'burn': bench_burn,
+    'graph': bench_graph,
+    'spawn': bench_spawn,
+}
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(baseline, current, threshold):
+    """Print a side by side of medians; returns the names that regressed"""
+    regressions = []
+    print(f"{'benchmark':<24} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None:
+            print(f"{name:<24} {'-':>10} {result['median_s']:>10.4f} {'new':>8}")
+            continue
+        change = result['median_s'] / old['median_s'] - 1 if old['median_s'] else 0.0
+        flag = ""
+        # Sub-millisecond wobble is scheduler noise, not a regression
+        if change > threshold and result['median_s'] - old['median_s'] > MIN_REGRESSION_S:
+            flag = "  ⚠️ regression"
+            regressions.append(name)
+        print(f"{name:<24} {old['median_s']:>10.4f} {result['median_s']:>10.4f} {change:>+7.1%}{flag}")
+    return regressions
+
+def run_case(args):
+    """Run a single case in this process (used by run via --case)"""
+    workdir = tempfile.mkdtemp(prefix=f'qa_bench_{args.case}_')
+    try:
+        results = CASES[args.case](args, workdir)
+    except ImportError as e:
+        print(f"⚠️ Skipping {args.case}: {e}")
+        results = {}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f)
+    return 0
+
+def run(args):
+    selected = args.only.split(',') if args.only else list(CASES)
+    unknown = set(selected) - set(CASES)
+    if unknown:
+        print(f"Unknown benchmark(s): {', '.join(sorted(unknown))}")
+        return 2
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'host': socket.gethostname(),
+            'machine': platform.machine(),
+            'python': platform.python_version(),
+            'git': git_revision(),
+            'repeats': args.repeats,
+        },
+        'results': {},
+    }
+
+    for name in selected:
+        print(f"⏱️  {name}...")
+        # Each case gets a fresh interpreter so module-level config (LOG_DIR,
+        # BACKEND_URL) and import caches don't leak between cases
+        with tempfile.NamedTemporaryFile(suffix='.json') as out:
+            proc = subprocess.run([
+                sys.executable, os.path.abspath(__file__), '--case', name,
+                '--repeats', str(args.repeats), '--output', out.name
+            ])
+            if proc.returncode != 0:
+                print(f"⚠️ {name} failed with exit code {proc.returncode}")
+                continue
+            with open(out.name) as f:
+                results = json.load(f)
+        if not results:
+            continue
+        for case, result in results.items():
+            print(f"   {case:<22} median {result['median_s'] * 1000:>10.2f} ms")
+        report['results'].update(results)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(baseline, report, args.threshold):
+            return 1
+    return 0
+
+def main():
+    if sys.argv[1:2] == ['compare']:
+        parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+        parser.add_argument('command')
+        parser.add_argument('baseline')
+        parser.add_argument('current')
+        parser.add_argument('--threshold', type=float, default=0.20,
+                            help='Flag medians slower by more than this fraction (default: 0.20)')
+        args = parser.parse_args()
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        sys.exit(1 if compare(baseline, current, args.threshold) else 0)
+
+    parser = argparse.ArgumentParser(description='Benchmark the QA hot paths')
+    parser.add_argument('--only', help=f"Comma separated subset of: {', '.join(CASES)}")
+    parser.add_argument('--repeats', type=int, default=9, help='Repeats for the fast cases (default: 9)')
+    parser.add_argument('--output', help='Result file (default: bench/results/<timestamp>.json)')
+    parser.add_argument('--baseline', help='Compare against this result file and exit 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help='Flag medians slower by more than this fraction (default: 0.20)')
+    parser.add_argument('--case', choices=list(CASES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    sys.exit(run_case(args) if args.case else run(args))
+
+if __name__ == "__main__":
+    main()
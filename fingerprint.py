@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+#
+# THERMAL FINGERPRINTS
+# Reduces a burn run to a handful of numbers and says how unusual they are
+# against the history in the warehouse (warehouse.py):
+#   tj_steady_stage0/1  median junction temp over the last half of each stage
+#   heatup_tau_s        seconds to cover 63.2% of the rise to stage 0 steady tj
+#   steady_power        mean Power TOT once warmed up (mW)
+#   fan_steady          median fan PWM over the same window
+#   power_fan_slope     least-squares Power TOT vs fan PWM (mW per PWM %)
+#
+#   python3 warehouse.py ingest "fleet/*/burn_test.csv"
+#   python3 fingerprint.py baseline            # refresh and print the bands
+#   python3 fingerprint.py score qa_logs/current/stage4_gpu/burn_test.csv
+#
+# Fingerprints are stored per run in the warehouse, keyed by the file's
+# sha256, and only computed for runs that don't have one for their current
+# content yet. Percentile bands are cached there too, and rebuilt (one
+# nanpercentile over the fingerprint matrix) only when the set of runs changed. Scores are robust z-scores: (value - median) / (IQR / 1.349).
+#
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from warehouse import DEFAULT_DB, STEADY_STATE_AFTER_S, connect, load_channels
+
+FEATURES = ['tj_steady_stage0', 'tj_steady_stage1', 'heatup_tau_s',
+            'steady_power', 'fan_steady', 'power_fan_slope']
+PERCENTILES = [5, 25, 50, 75, 95]
+
+# Runs shorter than this (5 s samples) never reach steady state
+MIN_BASELINE_SAMPLES = 120
+OUTLIER_SCORE = 3.0
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS fingerprints (
+    file_id INTEGER PRIMARY KEY REFERENCES files(id),
+    sha256 TEXT NOT NULL,
+    device TEXT NOT NULL,
+    samples INTEGER NOT NULL,
+    {', '.join(f'{name} REAL' for name in FEATURES)}
+);
+CREATE TABLE IF NOT EXISTS fingerprint_bands (
+    feature TEXT PRIMARY KEY,
+    {', '.join(f'p{p} REAL' for p in PERCENTILES)},
+    runs INTEGER NOT NULL,
+    signature TEXT NOT NULL
+);
+"""
+
+def _steady(values, mask):
+    """Median over the last half of the masked samples"""
+    picked = values[mask]
+    picked = picked[len(picked) // 2:]
+    picked = picked[~np.isnan(picked)]
+    return float(np.median(picked)) if len(picked) else None
+
+def compute(ts, stage, tj, power, fan):
+    """Fingerprint from aligned numpy arrays (ts in seconds, NaN for gaps)"""
+    result = dict.fromkeys(FEATURES)
+    if len(ts) == 0:
+        return result
+    stage = np.nan_to_num(stage, nan=0)
+
+    result['tj_steady_stage0'] = _steady(tj, stage == 0)
+    if (stage == 1).any():
+        result['tj_steady_stage1'] = _steady(tj, stage == 1)
+
+    valid = ~np.isnan(tj)
+    steady_tj = result['tj_steady_stage0']
+    if valid.any() and steady_tj is not None:
+        start_tj = tj[valid][0]
+        rise = steady_tj - start_tj
+        if rise > 2.0:  # under 2 °C is sensor noise, not a heat-up curve
+            reached = np.nonzero(valid & (tj >= start_tj + 0.632 * rise))[0]
+            if len(reached):
+                result['heatup_tau_s'] = float(ts[reached[0]] - ts[valid][0])
+
+    warm = ts >= ts[0] + STEADY_STATE_AFTER_S
+    if not warm.any():
+        warm = np.ones_like(ts, dtype=bool)
+    steady_power = power[warm & ~np.isnan(power)]
+    if len(steady_power):
+        result['steady_power'] = float(steady_power.mean())
+    steady_fan = fan[warm & ~np.isnan(fan)]
+    if len(steady_fan):
+        result['fan_steady'] = float(np.median(steady_fan))
+
+    both = ~np.isnan(power) & ~np.isnan(fan)
+    if both.sum() >= 3 and np.ptp(fan[both]) > 0:
+        result['power_fan_slope'] = float(np.polyfit(fan[both], power[both], 1)[0])
+    return result
+
+def from_frame(df):
+    """Fingerprint of a DataFrame from warehouse.load_channels"""
+    ts = ((df['time'] - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).to_numpy(dtype=float)
+    stage = pd.to_numeric(df['stage'], errors='coerce').to_numpy(dtype=float) if 'stage' in df.columns \
+        else np.zeros(len(df))
+    return compute(ts, stage, df['Temp tj'].to_numpy(dtype=float),
+                   df['Power TOT'].to_numpy(dtype=float), df['Fan pwmfan0'].to_numpy(dtype=float))
+
+def _create_tables(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(fingerprints)")]
+    if columns and 'sha256' not in columns:
+        # Fingerprints from before they were keyed by content: only a cache, rebuild
+        with conn:
+            conn.execute("DROP TABLE fingerprints")
+            conn.execute("DROP TABLE IF EXISTS fingerprint_bands")
+    conn.executescript(SCHEMA)
+
+def update_fingerprints(conn):
+    """Fingerprint every ingested run that doesn't have one for its current
+    content yet; returns how many"""
+    _create_tables(conn)
+    with conn:
+        # warehouse ingest replaces a changed file's row, and SQLite can hand
+        # the new row the old id, so match on the content hash, not the id
+        conn.execute("""
+            DELETE FROM fingerprints WHERE NOT EXISTS (
+                SELECT 1 FROM files WHERE files.id = fingerprints.file_id AND files.sha256 = fingerprints.sha256)
+        """)
+    pending = conn.execute("""
+        SELECT runs.file_id, files.sha256, runs.device FROM runs
+        JOIN files ON files.id = runs.file_id
+        LEFT JOIN fingerprints ON fingerprints.file_id = runs.file_id
+        WHERE fingerprints.file_id IS NULL
+    """).fetchall()
+    for file_id, sha256, device in pending:
+        rows = np.array(conn.execute(
+            "SELECT ts, stage, temp_tj, power_tot, fan FROM samples WHERE file_id = ? ORDER BY ts",
+            (file_id,)
+        ).fetchall(), dtype=float).reshape(-1, 5)
+        features = compute(*rows.T)
+        with conn:
+            conn.execute(
+                f"INSERT INTO fingerprints (file_id, sha256, device, samples, {', '.join(FEATURES)}) "
+                f"VALUES (?, ?, ?, ?, {', '.join('?' * len(FEATURES))})",
+                (file_id, sha256, device, len(rows), *[features[name] for name in FEATURES])
+            )
+    return len(pending)
+
+def load_bands(conn):
+    """Percentile bands per feature, rebuilt only when the baseline runs changed"""
+    added = update_fingerprints(conn)
+    # Which file contents are in the baseline; ids get reused, hashes don't
+    digest = hashlib.sha256()
+    for (sha256,) in conn.execute(
+        "SELECT sha256 FROM fingerprints WHERE samples >= ? ORDER BY sha256", (MIN_BASELINE_SAMPLES,)
+    ):
+        digest.update(sha256.encode())
+    signature = digest.hexdigest()
+    cached = conn.execute("SELECT * FROM fingerprint_bands").fetchall()
+    if cached and all(row[-1] == signature for row in cached):
+        return {row[0]: dict(zip(PERCENTILES, row[1:-2])) | {'runs': row[-2]} for row in cached}, added, False
+
+    matrix = np.array(conn.execute(
+        f"SELECT {', '.join(FEATURES)} FROM fingerprints WHERE samples >= ?", (MIN_BASELINE_SAMPLES,)
+    ).fetchall(), dtype=float).reshape(-1, len(FEATURES))
+    counts = (~np.isnan(matrix)).sum(axis=0)
+    if len(matrix):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # features no run has
+            bands = np.nanpercentile(matrix, PERCENTILES, axis=0)
+    else:
+        bands = np.full((len(PERCENTILES), len(FEATURES)), np.nan)
+
+    result = {}
+    with conn:
+        conn.execute("DELETE FROM fingerprint_bands")
+        for i, name in enumerate(FEATURES):
+            values = [None if np.isnan(v) else float(v) for v in bands[:, i]]
+            conn.execute(
+                f"INSERT INTO fingerprint_bands VALUES (?, {', '.join('?' * len(PERCENTILES))}, ?, ?)",
+                (name, *values, int(counts[i]), signature)
+            )
+            result[name] = dict(zip(PERCENTILES, values)) | {'runs': int(counts[i])}
+    return result, added, True
+
+def score(features, bands):
+    """Robust z-score per feature; None when there is nothing to compare against"""
+    scores = {}
+    for name in FEATURES:
+        value, band = features.get(name), bands.get(name)
+        if value is None or not band or band[50] is None or band['runs'] < 3:
+            scores[name] = None
+            continue
+        spread = (band[75] - band[25]) / 1.349
+        # Identical history: fall back to 5% of the median so a tiny drift isn't infinite
+        spread = spread or abs(band[50]) * 0.05 or 1.0
+        scores[name] = (value - band[50]) / spread
+    return scores
+
+def _fmt(value, digits=1):
+    return '-' if value is None else f"{value:.{digits}f}"
+
+def cmd_baseline(args):
+    conn = connect(args.db)
+    start = time.perf_counter()
+    bands, added, rebuilt = load_bands(conn)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    print(f"Baseline: {added} new fingerprints, bands {'rebuilt' if rebuilt else 'cached'} in {elapsed * 1000:.1f} ms")
+    print(f"{'feature':<18} {'runs':>5} " + ' '.join(f"{f'p{p}':>10}" for p in PERCENTILES))
+    for name in FEATURES:
+        band = bands[name]
+        print(f"{name:<18} {band['runs']:>5} " + ' '.join(f"{_fmt(band[p]):>10}" for p in PERCENTILES))
+    return 0
+
+def cmd_score(args):
+    start = time.perf_counter()
+    try:
+        df = load_channels(args.csv)
+    except (pd.errors.EmptyDataError, IndexError):
+        print(f"❌ No samples in {args.csv}")
+        return 1
+    features = from_frame(df)
+
+    conn = connect(args.db)
+    bands, _, _ = load_bands(conn)
+    conn.close()
+    scores = score(features, bands)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps({'csv': args.csv, 'features': features, 'scores': scores,
+                          'bands': {name: {f'p{p}': band[p] for p in PERCENTILES} | {'runs': band['runs']}
+                                    for name, band in bands.items()}}, indent=2))
+    else:
+        print(f"Fingerprint of {args.csv} ({len(df)} samples, {elapsed * 1000:.0f} ms)")
+        print(f"{'feature':<18} {'value':>10} {'p5':>10} {'p50':>10} {'p95':>10} {'score':>7}")
+        for name in FEATURES:
+            band = bands[name]
+            flag = ""
+            if scores[name] is not None and abs(scores[name]) >= args.threshold:
+                flag = "  ⚠️ outlier"
+            print(f"{name:<18} {_fmt(features[name]):>10} {_fmt(band[5]):>10} {_fmt(band[50]):>10} "
+                  f"{_fmt(band[95]):>10} {_fmt(scores[name], 2):>7}{flag}")
+
+    outliers = [name for name, s in scores.items() if s is not None and abs(s) >= args.threshold]
+    if not args.json:
+        if outliers:
+            print(f"⚠️ Outside the fleet baseline: {', '.join(outliers)}")
+        elif all(s is None for s in scores.values()):
+            print("⚠️ Not enough baseline runs to judge, ingest more logs with warehouse.py")
+        else:
+            print("✅ Thermal fingerprint within the fleet baseline")
+    return 1 if outliers and args.strict else 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Thermal fingerprints against the fleet baseline')
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'Warehouse file (default: {DEFAULT_DB})')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('baseline', help='Fingerprint new runs and print the percentile bands')
+    score_cmd = sub.add_parser('score', help='Score one burn log against the baseline')
+    score_cmd.add_argument('csv')
+    score_cmd.add_argument('--threshold', type=float, default=OUTLIER_SCORE,
+                           help=f'|score| that counts as an outlier (default: {OUTLIER_SCORE})')
+    score_cmd.add_argument('--strict', action='store_true', help='Exit 1 if any feature is an outlier')
+    score_cmd.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"No warehouse at {args.db}, run warehouse.py ingest first")
+        return 1
+    return cmd_baseline(args) if args.command == 'baseline' else cmd_score(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
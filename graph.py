@@ -1,24 +1,26 @@
 import sys
 import os
+import argparse
+import glob
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.dates import DateFormatter
 
+# Bump when render() output changes so batch mode re-renders cached PNGs
+RENDER_VERSION = 2
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python graph.py <path/to/stage*_burn_log.csv>")
-        sys.exit(1)
+# render_file's result for an empty or header-only log: skipped, not failed
+NO_SAMPLES = "no samples"
+MANIFEST_NAME = '.graph_manifest.json'
 
-    csv_path = sys.argv[1]
-    if not os.path.isfile(csv_path):
-        print(f"File not found: {csv_path}")
-        sys.exit(1)
-
-    # Ask user for a short description (sub-heading)
-    sub_heading = input("Enter graph name / description (will appear as sub-heading): ")
 
+def load_log(csv_path):
+    """Read a burn log into a DataFrame with numeric channels and CPU_avg"""
     df = pd.read_csv(csv_path)
 
     # Cast columns to proper dtypes
@@ -51,46 +53,107 @@ def main():
     # Detect shutdown row (last row with many NaNs)
     shutdown_time = None
     shutdown_threshold = 0.5  # >50% NaNs considered shutdown marker row
-    nan_ratio_last = df.iloc[-1].isna().mean()
-    if nan_ratio_last > shutdown_threshold:
+    # A header-only log has no rows; render_file reports it as no samples
+    if not df.empty and df.iloc[-1].isna().mean() > shutdown_threshold:
         shutdown_time = df.iloc[-1]['time']
         # Drop the shutdown marker row from plotting
         df = df.iloc[:-1]
 
+    df.attrs['stage_transition_time'] = stage_transition_time
+    df.attrs['shutdown_time'] = shutdown_time
+    return df
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of n_out points that keep the
+    visual shape of y(x) (peaks, dips, steps) far better than every-Nth.
+    Each bucket's triangle is anchored on the previous bucket's mean instead
+    of the point picked there, so every bucket is scored in one numpy pass
+    rather than a Python loop per bucket."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 buckets between the fixed first and last points; with
+    # n_out < n every bucket holds at least one point
+    starts = np.linspace(1, n - 1, n_out - 1).astype(np.int64)[:-1]
+    sums_x = np.add.reduceat(x[1:n - 1], starts - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], starts - 1)
+    sizes = np.diff(np.append(starts, n - 1))
+    mean_x, mean_y = sums_x / sizes, sums_y / sizes
+    # Triangle corners per bucket: previous bucket's mean (the first point
+    # for bucket 0) and next bucket's mean (the last point for the last one)
+    prev_x = np.concatenate(([x[0]], mean_x[:-1]))
+    prev_y = np.concatenate(([y[0]], mean_y[:-1]))
+    next_x = np.append(mean_x[1:], x[n - 1])
+    next_y = np.append(mean_y[1:], y[n - 1])
+
+    bucket = np.repeat(np.arange(len(starts)), sizes)
+    px, py = x[1:n - 1], y[1:n - 1]
+    area = np.abs((prev_x[bucket] - next_x[bucket]) * (py - prev_y[bucket]) -
+                  (prev_x[bucket] - px) * (next_y[bucket] - prev_y[bucket]))
+    # First point holding its bucket's largest area
+    best = np.flatnonzero(area == np.maximum.reduceat(area, starts - 1)[bucket])
+    _, first = np.unique(bucket[best], return_index=True)
+
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    idx[1:-1] = best[first] + 1
+    return idx
+
+
+def decimate(times, values, max_points=None):
+    """Downsample one channel with LTTB; short series are returned untouched"""
+    if not max_points or len(values) <= max_points:
+        return times, values
+    mask = values.notna().to_numpy()
+    times, values = times[mask], values[mask]
+    if len(values) <= max_points:
+        return times, values
+    x = times.to_numpy().astype('datetime64[ns]').astype(np.int64).astype(float)
+    keep = lttb(x, values.to_numpy(dtype=float), max_points)
+    return times.iloc[keep], values.iloc[keep]
+
+
+def render(df, out_png, sub_heading=None, dpi=300, max_points=None):
+    """Plot the five stacked panels for a loaded burn log and save to out_png.
+    With max_points each channel is LTTB-decimated to at most that many points."""
     # Build figure with 5 stacked sub-plots sharing the x-axis
     fig, axes = plt.subplots(5, 1, figsize=(14, 12), sharex=True)
 
     # 1. Temperature (Temp tj)
-    axes[0].plot(df['time'], df['Temp tj'], color='tab:red')
+    axes[0].plot(*decimate(df['time'], df['Temp tj'], max_points), color='tab:red')
     axes[0].set_ylabel('Temp tj (°C)')
     axes[0].set_title('Temperature')
 
     # 2. Power draw
-    axes[1].plot(df['time'], df['Power TOT'], color='tab:purple')
+    axes[1].plot(*decimate(df['time'], df['Power TOT'], max_points), color='tab:purple')
     axes[1].set_ylabel('Power (W)')
     axes[1].set_title('Total Power Draw')
 
     # 3. CPU utilisation
-    axes[2].plot(df['time'], df['CPU_avg'], color='tab:green')
+    axes[2].plot(*decimate(df['time'], df['CPU_avg'], max_points), color='tab:green')
     axes[2].set_ylabel('CPU Util (%)')
     axes[2].set_title('Average CPU Utilisation')
 
     # 4. GPU utilisation
-    axes[3].plot(df['time'], df['GPU'], color='tab:blue')
+    axes[3].plot(*decimate(df['time'], df['GPU'], max_points), color='tab:blue')
     axes[3].set_ylabel('GPU Util (%)')
     axes[3].set_title('GPU Utilisation')
 
     # 5. Fan PWM
-    axes[4].plot(df['time'], df['Fan pwmfan0'], color='tab:orange')
+    axes[4].plot(*decimate(df['time'], df['Fan pwmfan0'], max_points), color='tab:orange')
     axes[4].set_ylabel('Fan PWM')
     axes[4].set_title('Fan Speed (PWM value)')
 
     # Format the x-axis dates nicely on the last axis
     date_fmt = DateFormatter('%H:%M:%S')
     axes[-1].xaxis.set_major_formatter(date_fmt)
-    plt.xticks(rotation=45, ha='right')
+    plt.setp(axes[-1].get_xticklabels(), rotation=45, ha='right')
 
     # Add vertical lines for stage transition and shutdown events
+    # stage_transition_time = df.attrs.get('stage_transition_time')
+    # shutdown_time = df.attrs.get('shutdown_time')
     # for ax in axes:
     #     if stage_transition_time is not None and pd.notna(stage_transition_time):
     #         ax.axvline(stage_transition_time, color='grey', linestyle='--', label='Stage 0 → 1')
@@ -110,13 +173,169 @@ def main():
 
     fig.tight_layout(rect=[0, 0, 1, 0.9])
 
+    fig.savefig(out_png, dpi=dpi)
+    return fig
+
+
+def expand_inputs(patterns):
+    """CSV paths matching any of the given files/globs, sorted and de-duplicated"""
+    paths = set()
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True) or ([pattern] if os.path.isfile(pattern) else [])
+        paths.update(os.path.normpath(m) for m in matches if m.endswith('.csv') and os.path.isfile(m))
+    return sorted(paths)
+
+
+def output_names(csv_paths):
+    """PNG name per CSV; clashing basenames (e.g. burn_test.csv from many
+    units) fall back to the path with separators flattened"""
+    stems = [os.path.splitext(os.path.basename(p))[0] for p in csv_paths]
+    names = {}
+    for path, stem in zip(csv_paths, stems):
+        if stems.count(stem) > 1:
+            stem = os.path.splitext(os.path.relpath(path))[0].replace(os.sep, '__').lstrip('._')
+        names[path] = stem + '.png'
+    return names
+
+
+def input_hash(csv_path, settings):
+    """Content hash of the CSV plus everything that changes the picture"""
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode())
+    with open(csv_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def _init_worker():
+    # Headless: never open a window from a pool worker
+    plt.switch_backend('Agg')
+
+
+def render_file(csv_path, out_png, sub_heading, dpi, max_points):
+    """Pool task: load + render one log. Returns (error or None, seconds);
+    the error is NO_SAMPLES for a log with nothing to plot."""
+    start = time.perf_counter()
+    try:
+        df = load_log(csv_path)
+        if df.empty:
+            return NO_SAMPLES, time.perf_counter() - start
+        plt.close(render(df, out_png, sub_heading, dpi=dpi, max_points=max_points))
+    except pd.errors.EmptyDataError:
+        return NO_SAMPLES, time.perf_counter() - start
+    except Exception as e:
+        return f"{type(e).__name__}: {e}", time.perf_counter() - start
+    return None, time.perf_counter() - start
+
+
+def run_batch(args):
+    """Render every matching CSV in a process pool, skipping unchanged inputs.
+    Empty logs are counted apart and kept in the manifest; only errors fail."""
+    csv_paths = expand_inputs(args.paths)
+    if not csv_paths:
+        print(f"No CSV files match: {' '.join(args.paths)}")
+        return 1
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    manifest = load_manifest(args.out_dir)
+    names = output_names(csv_paths)
+
+    jobs = []
+    skipped = 0
+    for csv_path in csv_paths:
+        out_png = os.path.join(args.out_dir, names[csv_path])
+        sub_heading = args.subtitle or os.path.splitext(os.path.basename(csv_path))[0]
+        settings = {'version': RENDER_VERSION, 'dpi': args.dpi, 'max_points': args.max_points, 'sub_heading': sub_heading}
+        digest = input_hash(csv_path, settings)
+        entry = manifest.get(names[csv_path])
+        if not args.force and entry and entry.get('hash') == digest and \
+                (entry.get('empty') or os.path.exists(out_png)):
+            skipped += 1
+            continue
+        jobs.append((csv_path, out_png, sub_heading, digest))
+
+    print(f"{len(csv_paths)} logs: {len(jobs)} to render, {skipped} unchanged -> {args.out_dir}")
+    start = time.perf_counter()
+    failed = 0
+    empty = 0
+    if jobs:
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(render_file, csv_path, out_png, sub_heading, args.dpi, args.max_points): (csv_path, out_png, digest)
+                for csv_path, out_png, sub_heading, digest in jobs
+            }
+            for future in as_completed(futures):
+                csv_path, out_png, digest = futures[future]
+                error, seconds = future.result()
+                if error == NO_SAMPLES:
+                    empty += 1
+                    manifest[os.path.basename(out_png)] = {'hash': digest, 'source': csv_path, 'empty': True}
+                    print(f"⏭️ {csv_path}: no samples")
+                    continue
+                if error:
+                    failed += 1
+                    print(f"⚠️ {csv_path}: {error}")
+                    continue
+                manifest[os.path.basename(out_png)] = {'hash': digest, 'source': csv_path}
+                print(f"✅ {csv_path} -> {out_png} ({seconds:.1f}s)")
+        save_manifest(args.out_dir, manifest)
+
+    print(f"Rendered {len(jobs) - failed - empty}, skipped {skipped}, empty {empty}, failed {failed} "
+          f"in {time.perf_counter() - start:.1f}s")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Plot burn test logs. One CSV: interactive, as before. '
+                    '--batch: headless, parallel, for files and globs.'
+    )
+    parser.add_argument('paths', nargs='+', help='CSV file(s) or globs, e.g. "THERMALTEST/*benchmarks/*.csv"')
+    parser.add_argument('--batch', action='store_true', help='Render without prompting or showing windows')
+    parser.add_argument('--out-dir', default='graphs', help='Batch output directory (default: graphs)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='Worker processes (default: all cores)')
+    parser.add_argument('--max-points', type=int, default=2000,
+                        help='LTTB-decimate each channel to this many points, 0 to plot everything (default: 2000)')
+    parser.add_argument('--dpi', type=int, default=150, help='Batch output DPI (default: 150)')
+    parser.add_argument('--subtitle', help='Batch sub-heading (default: the file name)')
+    parser.add_argument('--force', action='store_true', help='Re-render even if the input is unchanged')
+    args = parser.parse_args()
+
+    if args.batch or len(args.paths) > 1:
+        plt.switch_backend('Agg')
+        sys.exit(run_batch(args))
+
+    csv_path = args.paths[0]
+    if not os.path.isfile(csv_path):
+        print(f"File not found: {csv_path}")
+        sys.exit(1)
+
+    # Ask user for a short description (sub-heading)
+    sub_heading = input("Enter graph name / description (will appear as sub-heading): ")
+
+    df = load_log(csv_path)
+
     # Save & show
     out_png = os.path.splitext(os.path.basename(csv_path))[0] + '.png'
-    plt.savefig(out_png, dpi=300)
+    render(df, out_png, sub_heading)
     print(f"Graph saved to {out_png}")
     plt.show()
 
 
 if __name__ == '__main__':
     main()
-
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+#
+# LOCAL BACKEND STAND-IN
+# Speaks the same two endpoints main.py uses on the ngrok backend:
+#   GET  /qa/<hostname>   -> {"name": ..., "stage": ...}
+#   POST /qa/upload       -> multipart form with name, stage and log files
+# plus GET /stats for the simulation and load tools.
+#
+#   python3 backend.py --port 8000
+#   export QA_BACKEND_URL=http://127.0.0.1:8000
+#
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def parse_multipart(body, content_type):
+    """Split a multipart/form-data body into {field: (filename, bytes)}"""
+    match = re.search(r'boundary="?([^";]+)"?', content_type)
+    if not match:
+        return {}
+    boundary = b'--' + match.group(1).encode()
+    fields = {}
+    for part in body.split(boundary):
+        if not part or part.startswith(b'--'):
+            continue
+        headers, _, value = part.partition(b'\r\n\r\n')
+        disposition = re.search(rb'name="([^"]*)"(?:; filename="([^"]*)")?', headers)
+        if not disposition:
+            continue
+        name = disposition.group(1).decode()
+        filename = (disposition.group(2) or b'').decode()
+        # Drop the CRLF that precedes the next boundary
+        fields[name] = (filename, value[:-2] if value.endswith(b'\r\n') else value)
+    return fields
+
+class BackendState:
+    """Device stages, last uploaded files and request counters"""
+
+    def __init__(self, delay=0.0, error_rate=0.0):
+        self.delay = delay
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.devices = {}
+        self.requests = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.uploads = {}
+        self.upload_bytes = {}
+        self.started = time.time()
+
+    def device(self, name):
+        return self.devices.setdefault(name, {'stage': None, 'files': {}, 'updated': None})
+
+    def set_stage(self, name, stage):
+        with self.lock:
+            self.device(name)['stage'] = stage
+
+    def stats(self):
+        with self.lock:
+            return {
+                'uptime': time.time() - self.started,
+                'requests': self.requests,
+                'errors': self.errors,
+                'bytes_in': self.bytes_in,
+                'uploads': dict(self.uploads),
+                'upload_bytes': dict(self.upload_bytes),
+                'devices': {
+                    name: {'stage': d['stage'], 'files': dict(d['files'])}
+                    for name, d in self.devices.items()
+                },
+            }
+
+class BackendHandler(BaseHTTPRequestHandler):
+    server_version = "qa-sim-backend"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.server.state
+        if self.path == '/stats':
+            self.send_json(200, state.stats())
+            return
+        match = re.fullmatch(r'/qa/([^/]+)', self.path)
+        if not match:
+            self.send_json(404, {'error': 'not found'})
+            return
+        with state.lock:
+            state.requests += 1
+            device = state.devices.get(match.group(1))
+            stage = device['stage'] if device else None
+        if stage is None:
+            self.send_json(404, {'error': 'unknown device'})
+        else:
+            self.send_json(200, {'name': match.group(1), 'stage': stage})
+
+    def do_POST(self):
+        state = self.server.state
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if state.delay:
+            time.sleep(state.delay)
+
+        with state.lock:
+            state.requests += 1
+            state.bytes_in += length
+            fail = random.random() < state.error_rate
+
+        if self.path != '/qa/upload':
+            self.send_json(404, {'error': 'not found'})
+            return
+        if fail:
+            with state.lock:
+                state.errors += 1
+            self.send_json(503, {'error': 'injected failure'})
+            return
+
+        fields = parse_multipart(body, self.headers.get('Content-Type', ''))
+        name = fields.get('name', ('', b''))[1].decode()
+        if not name:
+            with state.lock:
+                state.errors += 1
+            self.send_json(400, {'error': 'missing name'})
+            return
+
+        with state.lock:
+            device = state.device(name)
+            if 'stage' in fields:
+                device['stage'] = fields['stage'][1].decode()
+            for field, (filename, value) in fields.items():
+                if field in ('name', 'stage', '_'):
+                    continue
+                device['files'][field] = len(value)
+                state.uploads[field] = state.uploads.get(field, 0) + 1
+                state.upload_bytes[field] = state.upload_bytes.get(field, 0) + len(value)
+            device['updated'] = time.time()
+        self.send_json(200, {'ok': True})
+
+class BackendServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections once a few dozen devices upload at once
+    request_queue_size = 128
+
+def start_backend(host='127.0.0.1', port=0, delay=0.0, error_rate=0.0):
+    """Serve the stand-in in a background thread; returns (server, base_url)"""
+    server = BackendServer((host, port), BackendHandler)
+    server.state = BackendState(delay, error_rate)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the QA backend')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='Extra seconds of latency per upload (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of uploads answered with 503 (default: 0)')
+    args = parser.parse_args()
+
+    server, url = start_backend(args.host, args.port, args.delay, args.error_rate)
+    print(f"QA backend stand-in listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
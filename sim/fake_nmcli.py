@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+#
+# FAKE NMCLI (and iw) FOR OFFLINE RUNS
+# Keeps a tiny NetworkManager model in a JSON file so netwatch.py,
+# main.py and hotspot_test.sh can be exercised without real Wi-Fi.
+#
+#   export PATH=/home/truffle/QA/sim/bin:$PATH
+#   export FAKE_NMCLI_STATE=/tmp/fake_nmcli.json
+#   nmcli device wifi connect itsalltruffles password x ifname wlP1p1s0
+#
+# Inject events from a test or another shell:
+#   python3 fake_nmcli.py set state=disconnected connection= ip=
+#   python3 fake_nmcli.py set clients=1
+#   python3 fake_nmcli.py set fail_connects=2 connect_delay=3
+#
+
+import json
+import os
+import sys
+import time
+import uuid
+
+STATE_FILE = os.environ.get("FAKE_NMCLI_STATE", "/tmp/fake_nmcli.json")
+
+DEFAULT_STATE = {
+    'iface': 'wlP1p1s0',
+    'state': 'disconnected',
+    'connection': '',
+    'ip': '',
+    'clients': 0,
+    'networks': {'itsalltruffles': 72, 'TP_LINK_AP_E732': 58},
+    'profiles': [],
+    'connect_delay': 0,   # seconds before a connect completes
+    'fail_connects': 0,   # number of upcoming connects that fail
+}
+
+def load():
+    try:
+        with open(STATE_FILE) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    merged = dict(DEFAULT_STATE)
+    merged.update(state)
+    return merged
+
+def save(state):
+    # Atomic replace so a concurrent monitor never reads half a file
+    tmp = f"{STATE_FILE}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, STATE_FILE)
+
+def set_connected(state, name, ip):
+    state['state'] = 'connected'
+    state['connection'] = name
+    state['ip'] = ip
+    if name not in state['profiles']:
+        state['profiles'].append(name)
+
+def set_disconnected(state):
+    state['state'] = 'disconnected'
+    state['connection'] = ''
+    state['ip'] = ''
+    state['clients'] = 0
+
+def option(args, name, default=None):
+    if name in args and args.index(name) + 1 < len(args):
+        return args[args.index(name) + 1]
+    return default
+
+def cmd_device(state, args):
+    if args[:1] == ['status']:
+        print(f"{state['iface']}:wifi:{state['state']}:{state['connection']}")
+    elif args[:1] == ['show']:
+        code = {'connected': 100, 'connecting': 50, 'disconnected': 30}.get(state['state'], 0)
+        print(f"GENERAL.STATE:{code} ({state['state']})")
+        print(f"GENERAL.CONNECTION:{state['connection']}")
+        if state['ip']:
+            print(f"IP4.ADDRESS[1]:{state['ip']}")
+    elif args[:2] == ['wifi', 'connect']:
+        ssid = args[2]
+        if ssid not in state['networks']:
+            print(f"Error: No network with SSID '{ssid}' found.", file=sys.stderr)
+            return 10
+        if state['fail_connects'] > 0:
+            state['fail_connects'] -= 1
+            save(state)
+            print("Error: Connection activation failed: (7) Secrets were required, but not provided.", file=sys.stderr)
+            return 4
+        state['state'] = 'connecting'
+        save(state)
+        time.sleep(float(state['connect_delay']))
+        set_connected(state, ssid, '192.168.1.50/24')
+        save(state)
+        print(f"Device '{state['iface']}' successfully activated with '{uuid.uuid4()}'.")
+    elif args[:2] == ['wifi', 'hotspot']:
+        set_connected(state, option(args, 'con-name', 'Hotspot'), '10.42.0.1/24')
+        save(state)
+        print(f"Device '{state['iface']}' successfully activated with '{uuid.uuid4()}'.")
+    elif args[:2] == ['wifi', 'list']:
+        print("IN-USE  BSSID              SSID             MODE   CHAN  SIGNAL  BARS  SECURITY")
+        for ssid, signal in state['networks'].items():
+            in_use = '*' if ssid == state['connection'] else ' '
+            print(f"{in_use}       00:11:22:33:44:55  {ssid}  Infra  6     {signal}      ▂▄▆_  WPA2")
+    elif args[:1] == ['monitor']:
+        return cmd_monitor()
+    return 0
+
+def cmd_connection(state, args):
+    if args[:1] == ['show']:
+        active = '--active' in args
+        for name in state['profiles']:
+            is_active = name == state['connection']
+            if active and not is_active:
+                continue
+            device = state['iface'] if is_active else ''
+            print(f"{name}:{device}")
+    elif args[:1] == ['down']:
+        if args[1] == state['connection']:
+            set_disconnected(state)
+            save(state)
+    elif args[:1] == ['delete']:
+        if args[1] in state['profiles']:
+            state['profiles'].remove(args[1])
+        if args[1] == state['connection']:
+            set_disconnected(state)
+        save(state)
+    elif args[:1] == ['up']:
+        set_connected(state, args[1], '192.168.1.50/24')
+        save(state)
+    return 0
+
+def cmd_monitor():
+    """Print a line whenever the state file changes, like `nmcli monitor`"""
+    last = None
+    try:
+        while True:
+            state = load()
+            current = (state['state'], state['connection'], state['ip'], state['clients'])
+            if last is not None and current != last:
+                print(f"{state['iface']}: {state['state']}", flush=True)
+            last = current
+            time.sleep(0.05)
+    except (KeyboardInterrupt, BrokenPipeError):
+        return 0
+
+def cmd_set(state, args):
+    for pair in args:
+        key, _, value = pair.partition('=')
+        if isinstance(DEFAULT_STATE.get(key), int):
+            value = int(value)
+        state[key] = value
+    save(state)
+    return 0
+
+def cmd_iw(state, args):
+    # iw dev <iface> station dump
+    if 'station' in args:
+        for i in range(int(state['clients'])):
+            print(f"Station 02:00:00:00:00:{i:02x} (on {state['iface']})")
+    return 0
+
+def main(argv):
+    state = load()
+    if argv[:1] == ['--as-iw']:
+        return cmd_iw(state, argv[1:])
+    if argv[:1] == ['set']:
+        return cmd_set(state, argv[1:])
+
+    # Drop global options we don't model
+    args = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg in ('--wait', '-w', '-f', '--fields'):
+            skip = True
+        elif arg.startswith('-'):
+            continue
+        else:
+            args.append(arg)
+
+    if not args:
+        return 0
+    if args[0] in ('device', 'dev', 'd'):
+        return cmd_device(state, args[1:])
+    if args[0] in ('connection', 'con', 'c'):
+        if args[1:2] == ['modify']:
+            return 0
+        return cmd_connection(state, args[1:])
+    if args[0] == 'monitor':
+        return cmd_monitor()
+    if args[0] == 'general':
+        return 0
+    print(f"Error: fake nmcli does not model '{' '.join(args)}'", file=sys.stderr)
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
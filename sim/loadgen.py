@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+#
+# BACKEND LOAD GENERATOR
+# Simulates a fleet of Truffles talking to the backend through the real
+# client functions in src/main.py (get_current_stage, update_stage,
+# upload_log_file). Each virtual device runs in its own process with its
+# own hostname and log directory, grows its logs at realistic rates and
+# walks through stages 1-5 like a unit on the station, uploading every
+# active stream each STREAM_INTERVAL.
+#
+#   python3 sim/loadgen.py --sweep 1,10,25,50 --duration 60
+#   python3 sim/loadgen.py --devices 40 --stage 5 --url https://xxxx.ngrok.app
+#
+# Without --url a local backend stand-in (sim/backend.py) is started.
+#
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(SIM_DIR), 'src')
+
+sys.path.insert(0, SIM_DIR)
+from backend import start_backend
+
+# Virtual seconds each stage lasts on a real unit
+STAGE_DURATIONS = {1: 60, 2: 420, 3: 2100, 4: 14400, 5: 14400}
+
+# (log file, stream param, bytes appended per virtual second) per stage
+STAGE_STREAMS = {
+    1: [('led_test.txt', 'ledTestFile', 12)],
+    2: [('nvme_test.txt', 'nvmeTestFile', 8)],
+    3: [('hotspot_test.txt', 'hotspotTestFile', 4)],
+    4: [('burn_test.txt', 'gpuTestFile', 1)],
+    5: [('stage5_gpu_burn.txt', 'stage5GpuTestFile', 1),
+        ('stage5_nvme_test.txt', 'stage5NvmeTestFile', 2),
+        ('stage5_hotspot_test.txt', 'stage5HotspotTestFile', 4)],
+}
+
+LOG_LINE = "[2025-05-13 03:21:52] ✓ Chunk 7 verified (Write speed: 1532.40 MB/s) - simulated load line\n"
+# While the burn test runs a GPU stream sends the 1m rollup means (see
+# src/rollup.py) rather than burn_test.csv: one row per virtual minute, and
+# upload_log_file leaves it out when it hasn't changed since the last send
+ROLLUP_LINE = "2025-05-13 03:23:00,0,,,,,,,,71.164,29687.75,0.441,12.75,85.75,85.75,85.75,85.5,75.75,14.0,85.25,24.975,78.431\n"
+ROLLUP_BYTES_PER_SECOND = len(ROLLUP_LINE) / 60
+
+def grow(path, target, line):
+    """Append whole lines until the file is at least target bytes"""
+    # run_script_with_logging writes a header line before the script starts
+    target = max(target, 1)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    if size >= target:
+        return size
+    count = (target - size) // len(line.encode()) + 1
+    with open(path, 'a') as f:
+        f.write(line * count)
+    return os.path.getsize(path)
+
+class TimedRequests:
+    """Stands in for the requests module inside main.py. Every HTTP call is
+    timed on its own and its status code kept, because the client functions
+    hide failures (get_current_stage returns 0 on any error)."""
+
+    def __init__(self, real, calls):
+        self.real = real
+        self.calls = calls  # thread-local; timed() collects calls.made
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+    def _timed(self, func, *args, **kwargs):
+        start = time.time()
+        status = None  # no response at all
+        try:
+            response = func(*args, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            made = getattr(self.calls, 'made', None)
+            if made is not None:
+                made.append((status, start, time.time()))
+
+    def get(self, *args, **kwargs):
+        return self._timed(self.real.get, *args, **kwargs)
+
+    def post(self, *args, **kwargs):
+        return self._timed(self.real.post, *args, **kwargs)
+
+def reset_logs(log_dir):
+    for name in os.listdir(log_dir):
+        os.remove(os.path.join(log_dir, name))
+
+def device_worker(index, args, base_url, stop_at, results):
+    """One virtual Truffle: its own hostname, log dir and stage timeline"""
+    hostname = f"truffle-load-{index:04d}"
+    log_dir = tempfile.mkdtemp(prefix=f"{hostname}_")
+    os.environ['QA_HOSTNAME'] = hostname
+    os.environ['QA_LOG_DIR'] = log_dir
+    os.environ['QA_BACKEND_URL'] = base_url
+    # Measure the backend, not main.py's per-unit upload throttle
+    os.environ['QA_UPLOAD_KBPS'] = '0'
+    sys.path.insert(0, SRC_DIR)
+    import main
+    from rollup import stream_path
+
+    rng = random.Random(index)
+    records = []
+    lock = threading.Lock()
+    calls = threading.local()
+    graph_sizes = {}  # stream -> rollup size at its last upload
+    main.requests = TimedRequests(main.requests, calls)
+
+    def timed(kind, func, *func_args, nbytes=0, ok_status=(200,)):
+        calls.made = []
+        start = time.time()
+        func(*func_args)
+        end = time.time()
+        made, calls.made = calls.made, None
+        with lock:
+            # Latency and status of the HTTP request itself; a call that
+            # never reached the backend counts as an error
+            for status, req_start, req_end in made or [(None, start, end)]:
+                records.append((kind, status in ok_status, req_end - req_start, nbytes, req_start, req_end))
+
+    # main.py narrates every call; keep the worker quiet
+    with contextlib.redirect_stdout(io.StringIO()):
+        stage = args.stage or rng.randint(1, 5)
+        # Land somewhere inside the stage so log sizes vary across the fleet
+        stage_offset = rng.uniform(0, STAGE_DURATIONS[stage])
+        stage_start = time.monotonic()
+        # A device the backend hasn't seen yet is a 404, not a failure
+        timed('get_stage', main.get_current_stage, ok_status=(200, 404))
+        timed('update_stage', main.update_stage, stage)
+
+        while time.monotonic() < stop_at:
+            tick = time.monotonic()
+            stage_elapsed = (tick - stage_start) * args.scale + stage_offset
+
+            if stage_elapsed >= STAGE_DURATIONS[stage]:
+                # Next stage, or a fresh unit takes the slot after stage 5
+                stage = stage + 1 if stage < 5 else 1
+                if stage == 1:
+                    reset_logs(log_dir)
+                stage_start, stage_offset, stage_elapsed = tick, 0, 0
+                timed('update_stage', main.update_stage, stage)
+
+            threads = []
+            for log_filename, param, rate in STAGE_STREAMS[stage]:
+                nbytes = grow(os.path.join(log_dir, log_filename), int(stage_elapsed * rate), LOG_LINE)
+                if 'gpu' in param.lower():
+                    graph_target = int(stage_elapsed * ROLLUP_BYTES_PER_SECOND)
+                    graph_bytes = grow(stream_path(log_dir), graph_target, ROLLUP_LINE)
+                    if graph_sizes.get(param) != graph_bytes:
+                        graph_sizes[param] = graph_bytes
+                        nbytes += graph_bytes
+                thread = threading.Thread(
+                    target=timed, args=('upload', main.upload_log_file, log_filename, param, stage),
+                    kwargs={'nbytes': nbytes}
+                )
+                thread.start()
+                threads.append(thread)
+            for thread in threads:
+                thread.join()
+
+            # Same cadence as periodic_upload_worker: upload, then wait
+            time.sleep(max(0, min(args.interval, stop_at - time.monotonic())))
+
+    shutil.rmtree(log_dir, ignore_errors=True)
+    results.put(records)
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_level(devices, args, base_url):
+    """Run N devices for args.duration seconds and summarise what they saw"""
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    # Give every process time to import before the clock starts
+    stop_at = time.monotonic() + args.duration + args.warmup
+    procs = [
+        ctx.Process(target=device_worker, args=(i, args, base_url, stop_at, results))
+        for i in range(devices)
+    ]
+    for proc in procs:
+        proc.start()
+    records = []
+    for _ in procs:
+        records.extend(results.get())
+    for proc in procs:
+        proc.join()
+
+    # Measure over the window where requests were actually in flight
+    wall = (max(r[5] for r in records) - min(r[4] for r in records)) if records else 0.0
+    wall = max(wall, 1e-6)
+
+    uploads = [r for r in records if r[0] == 'upload']
+    latencies = sorted(r[2] for r in records)
+    errors = sum(1 for r in records if not r[1])
+    sent = sum(r[3] for r in uploads)
+    return {
+        'devices': devices,
+        'wall_s': wall,
+        'requests': len(records),
+        'uploads': len(uploads),
+        'request_rate': len(records) / wall,
+        'error_rate': errors / len(records) if records else 0.0,
+        'latency_p50_ms': percentile(latencies, 50) * 1000,
+        'latency_p95_ms': percentile(latencies, 95) * 1000,
+        'latency_p99_ms': percentile(latencies, 99) * 1000,
+        'latency_max_ms': (latencies[-1] if latencies else 0) * 1000,
+        'upload_bytes': sent,
+        'bytes_per_s': sent / wall,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate a fleet of devices against the QA backend')
+    parser.add_argument('--url', help='Backend base URL (default: start a local stand-in)')
+    parser.add_argument('--devices', type=int, default=10, help='Number of virtual devices (default: 10)')
+    parser.add_argument('--sweep', help='Comma separated device counts to run in turn, e.g. 1,10,25,50')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds per level (default: 60)')
+    parser.add_argument('--warmup', type=float, default=3, help='Extra seconds for worker startup (default: 3)')
+    parser.add_argument('--interval', type=float, default=10, help='Upload interval in seconds (default: 10, like STREAM_INTERVAL)')
+    parser.add_argument('--scale', type=float, default=60,
+                        help='Virtual log-growth seconds per real second (default: 60)')
+    parser.add_argument('--stage', type=int, choices=sorted(STAGE_DURATIONS),
+                        help='Start every device in this stage (default: random mix)')
+    parser.add_argument('--delay', type=float, default=0.0, help='Latency injected by the local stand-in')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='503 rate injected by the local stand-in')
+    parser.add_argument('--json', help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server, base_url = start_backend(delay=args.delay, error_rate=args.error_rate)
+        print(f"Started local backend stand-in at {base_url}")
+
+    levels = [int(n) for n in args.sweep.split(',')] if args.sweep else [args.devices]
+    results = []
+    print(f"{'devices':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'MB/s':>7}")
+    for devices in levels:
+        level = run_level(devices, args, base_url)
+        results.append(level)
+        print(f"{devices:>7} {level['request_rate']:>7.1f} {level['latency_p50_ms']:>8.1f} "
+              f"{level['latency_p95_ms']:>8.1f} {level['latency_p99_ms']:>8.1f} "
+              f"{level['error_rate']:>6.1%} {level['bytes_per_s'] / 1e6:>7.2f}")
+
+    if server:
+        server.shutdown()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'url': base_url, 'args': vars(args), 'levels': results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
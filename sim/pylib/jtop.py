@@ -0,0 +1,73 @@
+#
+# FAKE JTOP
+# Stands in for jetson-stats in simulation runs by replaying a recorded
+# burn log (SIM_TELEMETRY_CSV) as live telemetry. The row served follows
+# the (virtual) clock, so a 4 hour replay takes 4 virtual hours.
+#
+
+import csv
+import os
+import time
+from datetime import datetime
+
+DEFAULT_CSV = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..',
+    'THERMALTEST', 'benchmarks', 'benchmark_log_2025-05-08_22-46-09.csv'
+)
+
+def load_samples(csv_path):
+    """Read a burn log into (seconds since start, stats dict) pairs"""
+    samples = []
+    start = None
+    with open(csv_path, newline='') as f:
+        for row in csv.DictReader(f):
+            try:
+                ts = datetime.strptime(row['time'], "%Y-%m-%d %H:%M:%S").timestamp()
+            except (KeyError, ValueError):
+                continue
+            if start is None:
+                start = ts
+            stats = {}
+            for key, value in row.items():
+                if key in ('time', 'stage') or value in (None, ''):
+                    continue
+                try:
+                    stats[key] = float(value)
+                except ValueError:
+                    pass
+            samples.append((ts - start, stats))
+    return samples
+
+class jtop:
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._samples = load_samples(os.environ.get("SIM_TELEMETRY_CSV", DEFAULT_CSV))
+        self._start = None
+        self._index = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        self._start = time.time()
+
+    def close(self):
+        pass
+
+    def ok(self):
+        return bool(self._samples)
+
+    @property
+    def stats(self):
+        # Loop the recording if the test outlives it
+        span = self._samples[-1][0] + 1
+        elapsed = (time.time() - self._start) % span
+        if self._samples[self._index][0] > elapsed:
+            self._index = 0
+        while self._index + 1 < len(self._samples) and self._samples[self._index + 1][0] <= elapsed:
+            self._index += 1
+        return dict(self._samples[self._index][1])
@@ -0,0 +1,56 @@
+#
+# VIRTUAL CLOCK FOR SIMULATION RUNS
+# Imported automatically by every python3 started with sim/pylib on
+# PYTHONPATH. With QA_TIME_SCALE=600 one real second is ten virtual
+# minutes, and time.time, time.monotonic, time.sleep, threading.Condition.wait
+# (so Event.wait too) and datetime.now all agree on it. QA_SIM_EPOCH pins the shared origin
+# so main.py, burn_test.py and the bash shims see the same virtual time.
+#
+
+import os
+
+_scale = float(os.environ.get("QA_TIME_SCALE") or 0)
+
+if _scale > 0:
+    # Bind the real clock into these modules before we patch it, so
+    # subprocess timeouts and lock internals keep running in real time
+    import datetime as _datetime
+    import subprocess  # noqa: F401
+    import threading
+    import time
+
+    _real_time = time.time
+    _real_monotonic = time.monotonic
+    _real_sleep = time.sleep
+    _real_wait = threading.Condition.wait
+
+    _epoch = float(os.environ.get("QA_SIM_EPOCH") or _real_time())
+    _monotonic_epoch = _real_monotonic()
+
+    def _virtual_time():
+        return _epoch + (_real_time() - _epoch) * _scale
+
+    def _virtual_monotonic():
+        return _monotonic_epoch + (_real_monotonic() - _monotonic_epoch) * _scale
+
+    def _virtual_sleep(seconds):
+        _real_sleep(seconds / _scale)
+
+    def _virtual_wait(self, timeout=None):
+        return _real_wait(self, None if timeout is None else timeout / _scale)
+
+    class _VirtualDatetime(_datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.fromtimestamp(_virtual_time(), tz)
+
+        @classmethod
+        def today(cls):
+            return cls.now()
+
+    time.time = _virtual_time
+    time.monotonic = _virtual_monotonic
+    time.sleep = _virtual_sleep
+    # Event.wait goes through Condition.wait, so this covers both
+    threading.Condition.wait = _virtual_wait
+    _datetime.datetime = _VirtualDatetime
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+#
+# QA PIPELINE SIMULATION
+# Runs the real src/main.py orchestration end to end without a Jetson:
+#   - burn_test.py runs for real against a fake jtop replaying a
+#     THERMALTEST/benchmarks CSV, with stub gpu_burn/stress/LED binaries
+#   - hotspot_test.sh and netwatch.py run for real against the fake nmcli
+#   - the LED and NVMe stages are replaced by hardware-free stand-ins
+#     from sim/stages with the same timeline and log lines
+#   - uploads go to the local backend stand-in (sim/backend.py)
+# A virtual clock (sim/pylib/sitecustomize.py plus sleep/date shims)
+# compresses stage time, so hours of QA take seconds to minutes.
+#
+#   python3 sim/run_sim.py --scale 600
+#   python3 sim/run_sim.py --start-stage 4 --telemetry THERMALTEST/benchmarks/<log>.csv
+#
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SIM_DIR)
+SRC_DIR = os.path.join(REPO_DIR, 'src')
+
+sys.path.insert(0, SIM_DIR)
+sys.path.insert(0, os.path.join(SIM_DIR, 'pylib'))
+from backend import start_backend
+from jtop import load_samples
+
+# Same mapping as src/main.py (importing main would pull in requests)
+STAGE_MAPPING = {0: "setup", 1: "led", 2: "nvme", 3: "hotspot", 4: "gpu", 5: "final"}
+
+# Scripts main.py runs from its working directory
+REAL_SCRIPTS = ['burn_test.py', 'hotspot_test.sh', 'netwatch.py']
+STAGE_STANDINS = ['led_test.sh', 'nvme_test.sh']
+
+def longest_benchmark():
+    """Largest log in THERMALTEST/benchmarks, several of them are empty"""
+    bench_dir = os.path.join(REPO_DIR, 'THERMALTEST', 'benchmarks')
+    logs = [os.path.join(bench_dir, f) for f in os.listdir(bench_dir) if f.endswith('.csv')]
+    return max(logs, key=os.path.getsize)
+
+def build_workdir(root):
+    """Lay out a src/ directory mixing real scripts and stand-ins"""
+    workdir = os.path.join(root, 'src')
+    os.makedirs(workdir)
+    for name in REAL_SCRIPTS:
+        os.symlink(os.path.join(SRC_DIR, name), os.path.join(workdir, name))
+    for name in STAGE_STANDINS:
+        os.symlink(os.path.join(SIM_DIR, 'stages', name), os.path.join(workdir, name))
+    return workdir
+
+def build_env(args, root, backend_url):
+    env = os.environ.copy()
+    env.update({
+        'PATH': os.pathsep.join([os.path.join(SIM_DIR, 'bin'), os.path.join(SIM_DIR, 'stubs'), env.get('PATH', '')]),
+        'PYTHONPATH': os.path.join(SIM_DIR, 'pylib'),
+        'PYTHONUNBUFFERED': '1',
+        'QA_TIME_SCALE': str(args.scale),
+        'QA_SIM_EPOCH': repr(time.time()),
+        'QA_ROOT': os.path.join(SIM_DIR, 'root'),
+        'QA_LOG_DIR': os.path.join(root, 'qa_logs'),
+        'QA_STRESS_BIN': os.path.join(SIM_DIR, 'stubs', 'stress'),
+        'QA_BACKEND_URL': backend_url,
+        'FAKE_NMCLI_STATE': os.path.join(root, 'nmcli.json'),
+        'SIM_TELEMETRY_CSV': os.path.abspath(args.telemetry),
+    })
+    return env
+
+def run(args):
+    if not load_samples(args.telemetry):
+        print(f"❌ No telemetry samples in {args.telemetry}")
+        return 1
+
+    root = tempfile.mkdtemp(prefix='qa_sim_')
+    server, backend_url = start_backend()
+    hostname = socket.gethostname()
+    if args.start_stage > 0:
+        server.state.set_stage(hostname, STAGE_MAPPING[args.start_stage])
+
+    workdir = build_workdir(root)
+    env = build_env(args, root, backend_url)
+    if args.trace:
+        env['QA_TRACE'] = '1'
+
+    # Unit starts on the primary network, like after stage 0
+    subprocess.run(
+        [sys.executable, os.path.join(SIM_DIR, 'fake_nmcli.py'), 'set',
+         'state=connected', 'connection=itsalltruffles', 'ip=192.168.1.50/24'],
+        env=dict(env, QA_TIME_SCALE=''), check=True
+    )
+
+    print(f"🧪 Simulating QA run for {hostname} at {args.scale:g}x")
+    print(f"   workdir: {root}")
+    print(f"   backend: {backend_url}")
+    print(f"   telemetry: {args.telemetry}")
+
+    stage_marks = []
+    main_log = os.path.join(root, 'main.log')
+    start = time.monotonic()
+    with open(main_log, 'w') as log_file:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(SRC_DIR, 'main.py')],
+            cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        for line in proc.stdout:
+            elapsed = time.monotonic() - start
+            log_file.write(line)
+            match = re.match(r'--- Stage (\d)', line.strip())
+            if match:
+                stage_marks.append((int(match.group(1)), elapsed))
+            if args.verbose or match:
+                print(f"[{elapsed:7.2f}s] {line.rstrip()}")
+        returncode = proc.wait()
+    wall = time.monotonic() - start
+
+    stats = server.state.stats()
+    server.shutdown()
+
+    stages = []
+    for i, (stage, begin) in enumerate(stage_marks):
+        end = stage_marks[i + 1][1] if i + 1 < len(stage_marks) else wall
+        stages.append({'stage': stage, 'real_s': end - begin, 'virtual_s': (end - begin) * args.scale})
+
+    summary = {
+        'exit_code': returncode,
+        'scale': args.scale,
+        'real_s': wall,
+        'virtual_s': wall * args.scale,
+        'stages': stages,
+        'backend': stats,
+        'workdir': root,
+    }
+
+    print("\n=== Simulation summary ===")
+    print(f"exit code: {returncode}")
+    print(f"wall time: {wall:.1f}s real ≈ {wall * args.scale / 3600:.2f}h virtual")
+    for s in stages:
+        print(f"  stage {s['stage']} ({STAGE_MAPPING[s['stage']]}): {s['real_s']:.2f}s real ≈ {s['virtual_s'] / 60:.1f} min virtual")
+    print(f"backend: {stats['requests']} requests, {stats['bytes_in'] / 1e6:.1f} MB in, {stats['errors']} errors")
+    for field, count in sorted(stats['uploads'].items()):
+        print(f"  {field}: {count} uploads, {stats['upload_bytes'].get(field, 0) / 1e6:.2f} MB")
+    final = stats['devices'].get(hostname, {}).get('stage')
+    print(f"final backend stage: {final}")
+
+    if args.trace:
+        # main.py prints its span summary on exit; spans are in virtual seconds
+        with open(main_log) as f:
+            text = f.read()
+        if '⏱️ Where the time went' in text:
+            print(text[text.index('⏱️ Where the time went'):].rstrip())
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary written to {args.json}")
+
+    if args.keep:
+        print(f"Logs kept in {root}")
+    else:
+        shutil.rmtree(root, ignore_errors=True)
+    return returncode
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the QA pipeline against simulated hardware')
+    parser.add_argument('--scale', type=float, default=600,
+                        help='Virtual seconds per real second (default: 600)')
+    parser.add_argument('--telemetry', default=longest_benchmark(),
+                        help='Burn log CSV replayed as jtop telemetry (default: longest in THERMALTEST/benchmarks)')
+    parser.add_argument('--start-stage', type=int, default=1, choices=sorted(STAGE_MAPPING),
+                        help='Stage the backend reports on startup (default: 1)')
+    parser.add_argument('--json', help='Write the run summary as JSON to this path')
+    parser.add_argument('--trace', action='store_true', help='Record spans (QA_TRACE) and print where the time went')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary workdir and logs')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Echo every main.py line')
+    args = parser.parse_args()
+    sys.exit(run(args))
+
+if __name__ == "__main__":
+    main()
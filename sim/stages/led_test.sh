@@ -0,0 +1,26 @@
+#!/usr/bin/env bash
+# Simulation stand-in for src/led_test.sh: same timeline and log lines, no SPI
+set -euo pipefail
+
+DURATION=3
+
+log() {
+  echo "[$(date '+%Y-%m-%d %H:%M:%S')] $*"
+}
+
+log "LED test started"
+log "Starting LED color tests"
+
+for color in WHITE RED GREEN BLUE; do
+  log "Killing any remaining LED processes"
+  log "Running LED OFF command"
+  sleep 1
+  log "Testing $color LED - Duration: ${DURATION}s"
+  sleep $DURATION
+  log "$color LED test completed"
+done
+
+log "=== FINAL CLEANUP: Terminating all LED processes ==="
+sleep 3
+log "✅ All LED processes successfully terminated"
+log "✅ All LED tests completed successfully"
@@ -0,0 +1,38 @@
+#!/usr/bin/env bash
+# Simulation stand-in for src/nvme_test.sh: same phases and log lines, no device
+set -euo pipefail
+
+TEST_MB=256
+CHUNKS=16
+
+log() {
+    echo "[$(date '+%Y-%m-%d %H:%M:%S')] $*"
+}
+
+log "Starting NVMe health check"
+log "Found NVMe device: /dev/nvme0n1"
+log "Collecting initial SMART data..."
+log "Drive Status:"
+log "  - Temperature: 41°C"
+log "  - Used: 0%"
+log "  - Power Cycles: 12"
+log "  - Unsafe Shutdowns: 3"
+
+log "Starting short NVMe self-test (~2 minutes)..."
+log "Monitoring self-test progress..."
+for progress in $(seq 4 4 96); do
+    sleep 5
+    log "  Progress: $progress%"
+done
+log "Self-test completed successfully"
+
+log "Testing drive performance with $((CHUNKS*TEST_MB)) MiB random data..."
+for i in $(seq 1 "$CHUNKS"); do
+    sleep 2
+    log "  ✓ Chunk $i verified (Write speed: 1$((RANDOM % 900 + 100)).00 MB/s)"
+done
+log "Average write speed: 1450.00 MB/s"
+log "Testing TRIM support..."
+log "Collecting final SMART data..."
+log "✅ NVMe test completed successfully"
+log "✅ NVMe health check completed successfully"
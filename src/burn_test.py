@@ -1,6 +1,6 @@
 #!/usr/bin/python3
 #
-# TWO-STAGE THERMAL TEST: 
+# TWO-STAGE THERMAL TEST:
 # STAGE 0: WITHOUT LEDS
 # STAGE 1: WITH LEDS
 #
@@ -14,51 +14,64 @@ from jtop import jtop
 import subprocess
 import sys
 import signal
+import json
+import placement
+from rollup import open_rollups
 
 def log(message):
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}")
 
-# Parse command line arguments
-parser = argparse.ArgumentParser(description='Two-stage thermal test with LED control')
-parser.add_argument('--stage-one', type=float, default=2.0,
-                    help='Duration of stage one (without LEDs) in hours (default: 2.0)')
-parser.add_argument('--stage-two', type=float, default=2.0,
-                    help='Duration of stage two (with LEDs) in hours (default: 2.0)')
-args = parser.parse_args()
-
-# Convert hours to seconds
-STAGE_ONE_DURATION = int(args.stage_one * 3600)  # Convert hours to seconds
-STAGE_TWO_DURATION = int(args.stage_two * 3600)  # Convert hours to seconds
-TOTAL_DURATION = STAGE_ONE_DURATION + STAGE_TWO_DURATION
-
 # How often to write data to CSV file (seconds)
 LOG_INTERVAL = 5
 
 # Get the directory containing the script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Change to the script's directory to ensure all relative paths work
-os.chdir(SCRIPT_DIR)
+# Device paths (overridable so the simulation harness in sim/ can swap in stubs)
+QA_ROOT = os.environ.get("QA_ROOT", "/home/truffle/QA")
+LOG_DIR = os.environ.get("QA_LOG_DIR", "/home/truffle/qa_logs")
+STRESS_BIN = os.environ.get("QA_STRESS_BIN", "/usr/bin/stress")
 
-log(f"Starting TWO-STAGE THERMAL TEST")
-log(f"STAGE 0: {args.stage_one:.1f} hours WITHOUT LEDs")
-log(f"STAGE 1: {args.stage_two:.1f} hours WITH LEDs")
-log(f"LOGGING TO CSV EVERY {LOG_INTERVAL} SECONDS")
+led_stress_command = [f"{QA_ROOT}/led_test/led_white"]
+led_off_command = ["sudo", f"{QA_ROOT}/led_test/ledoff"]
+
+# CSV columns, in order; everything after time and stage comes from jtop
+FIELDNAMES = ['time', 'stage', 'Temp CPU', 'Temp GPU', 'Temp SOC0', 'Temp SOC1', 'Temp SOC2',
+              'Temp Tboard', 'Temp Tdiode', 'Temp tj', 'Power TOT', 'RAM', 'CPU1',
+              'CPU2', 'CPU3', 'CPU4', 'CPU5', 'CPU6', 'CPU7', 'CPU8', 'GPU', 'Fan pwmfan0']
 
 benchmark_processes = None
 
-# Define commands for stress tools
-gpu_stress_command = ["/home/truffle/QA/THERMALTEST/gpu_burn", "-c", "/home/truffle/QA/THERMALTEST/compare.ptx", "-m", "85%", str(TOTAL_DURATION + 60)]
-cpu_stress_command = ["/usr/bin/stress", "-c", "2", "-t", str(TOTAL_DURATION + 60)]
-led_stress_command = ["/home/truffle/QA/led_test/led_white"]
-led_off_command = ["sudo", "/home/truffle/QA/led_test/ledoff"]
+# CPU placement from placement.json (see placement.py) and what it came to,
+# kept in <log dir>/placement.json for main.py to put in run.json
+placement_policy = placement.load_policy()
+placement_record = {'sampler': None, 'processes': []}
+placement_file = None
 
-def _start(cmd):
-    # Each tool gets its own process-group so we can kill children cleanly
-    return subprocess.Popen(cmd, preexec_fn=os.setsid)
+def save_placement():
+    # Via rename: main.py may read it while we're still adding processes
+    if placement_file:
+        with open(placement_file + '.tmp', 'w') as f:
+            json.dump(placement_record, f, indent=2)
+        os.replace(placement_file + '.tmp', placement_file)
 
-def start_cpu_gpu_benchmark():
+def _start(cmd):
+    # Each tool gets its own process-group so we can kill children cleanly,
+    # and lands on the stress CPUs before it execs
+    name = os.path.basename(cmd[0])
+    cmd = placement.command(placement_policy, 'stress', cmd)
+    proc = subprocess.Popen(cmd, preexec_fn=placement.preexec(placement_policy, 'stress', os.setsid))
+    record = placement.spawned(placement_policy, 'stress', proc, cmd)
+    log(f"{name} placed as {placement.summary(record)}")
+    placement_record['processes'].append(record)
+    save_placement()
+    return proc
+
+def start_cpu_gpu_benchmark(total_duration):
     log("Starting CPU and GPU stress...")
+    # Stress tools get an extra minute so they outlive the sampling loop
+    gpu_stress_command = [f"{QA_ROOT}/THERMALTEST/gpu_burn", "-c", f"{QA_ROOT}/THERMALTEST/compare.ptx", "-m", "85%", str(total_duration + 60)]
+    cpu_stress_command = [STRESS_BIN, "-c", "2", "-t", str(total_duration + 60)]
     return [
         _start(gpu_stress_command),
         _start(cpu_stress_command),
@@ -76,7 +89,7 @@ def turn_off_leds():
     except subprocess.CalledProcessError as e:
         log(f"Failed to turn off LEDs: {e}")
     except FileNotFoundError:
-        log("LED off command not found. Make sure /home/truffle/QA/led_test/ledoff exists")
+        log(f"LED off command not found. Make sure {QA_ROOT}/led_test/ledoff exists")
 
 def stop_benchmark():
     global benchmark_processes
@@ -101,109 +114,140 @@ def signal_handler(sig, frame):
     turn_off_leds()   # Make sure LEDs are off
     sys.exit(0)       # Exit the program
 
-signal.signal(signal.SIGINT, signal_handler)
-
-# Create a fixed filename for the CSV log in our unified log directory
-csv_filename = "/home/truffle/qa_logs/burn_test.csv"
-log(f"SAVING CSV TO {csv_filename}")
-
-# Create logs directory if it doesn't exist
-os.makedirs("/home/truffle/qa_logs", exist_ok=True)
-
-# Start the CPU and GPU benchmarks
-benchmark_processes = start_cpu_gpu_benchmark()
-led_process = None
-
-# Make sure LEDs are off at the beginning
-turn_off_leds()
-
-# Open CSV file for writing
-with open(csv_filename, mode='w', newline='') as csvfile:
-    fieldnames = ['time', 'stage', 'Temp CPU', 'Temp GPU', 'Temp SOC0', 'Temp SOC1', 'Temp SOC2', 
-                  'Temp Tboard', 'Temp Tdiode', 'Temp tj', 'Power TOT', 'RAM', 'CPU1', 
-                  'CPU2', 'CPU3', 'CPU4', 'CPU5', 'CPU6', 'CPU7', 'CPU8', 'GPU', 'Fan pwmfan0']
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-    # Write header to CSV
-    writer.writeheader()
-
-    start_time = time.time()
-    last_update_time = time.time()
-    current_stage = 0
-
-    # Use jtop to monitor the Jetson stats
-    with jtop() as jetson:
-        while jetson.ok():
-            current_time = time.time()
-            elapsed_time = current_time - start_time
-            
-            # Check if we need to switch to stage 1
-            if current_stage == 0 and elapsed_time >= STAGE_ONE_DURATION:
-                log("--- SWITCHING TO STAGE 1: WITH LEDS ---")
-                current_stage = 1
-                led_process = start_led_benchmark()
-                if led_process:
-                    benchmark_processes.append(led_process)
-            
-            # Check if test is complete
-            if elapsed_time >= TOTAL_DURATION:
-                break
-            
-            # Get stats from jetson
-            stats = jetson.stats
-            
-            # Log the data with stage information
-            row = {
-                'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'stage': current_stage,  # 0 = without LEDs, 1 = with LEDs
-                'Temp CPU': stats.get('Temp CPU', None),
-                'Temp GPU': stats.get('Temp GPU', None),
-                'Temp SOC0': stats.get('Temp SOC0', None),
-                'Temp SOC1': stats.get('Temp SOC1', None),
-                'Temp SOC2': stats.get('Temp SOC2', None),
-                'Temp Tboard': stats.get('Temp Tboard', None),
-                'Temp Tdiode': stats.get('Temp Tdiode', None),
-                'Temp tj': stats.get('Temp tj', None),
-                'Power TOT': stats.get('Power TOT', None),
-                'RAM': stats.get('RAM', None),
-                'CPU1': stats.get('CPU1', None),
-                'CPU2': stats.get('CPU2', None),
-                'CPU3': stats.get('CPU3', None),
-                'CPU4': stats.get('CPU4', None),
-                'CPU5': stats.get('CPU5', None),
-                'CPU6': stats.get('CPU6', None),
-                'CPU7': stats.get('CPU7', None),
-                'CPU8': stats.get('CPU8', None),
-                'GPU': stats.get('GPU', None), 
-                'Fan pwmfan0': stats.get('Fan pwmfan0', None)
-            }
-
-            # Write the data row to the CSV file
-            writer.writerow(row)
-            # Make sure to flush to disk so the file is always up to date
-            csvfile.flush()
-
-            # Sleep to control logging frequency
-            time.sleep(LOG_INTERVAL)
-            
-            # Periodic status updates
-            if current_time - last_update_time > 300:  # Update every 5 minutes
-                last_update_time = current_time
-                hours_elapsed = elapsed_time / 3600
-                hours_total = TOTAL_DURATION / 3600
-                stage_name = "WITHOUT LEDs" if current_stage == 0 else "WITH LEDs"
-                log(f"Status: STAGE {current_stage} ({stage_name})")
-                log(f"Time elapsed: {hours_elapsed:.2f} hours / {hours_total:.2f} hours total")
-                log(f"Junction temp: {stats.get('Temp tj', 'N/A')}°C, Fan: {stats.get('Fan pwmfan0', 'N/A')}%")
-
-log("Test completed!")
-log(f"CSV file saved to {csv_filename}")
-log("Stopping stress tools...")
-
-# Stop all benchmarks
-stop_benchmark()
-
-# Make sure LEDs are off at the end
-turn_off_leds()
-
-log("✅ GPU burn test finished successfully")
+def build_row(stats, current_stage):
+    """Build one CSV row from a jtop stats snapshot"""
+    row = {
+        'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'stage': current_stage,  # 0 = without LEDs, 1 = with LEDs
+    }
+    for field in FIELDNAMES[2:]:
+        row[field] = stats.get(field, None)
+    return row
+
+def write_sample(writer, csvfile, stats, current_stage, rollups=()):
+    """Append one sample and flush so the uploader always sees it"""
+    writer.writerow(build_row(stats, current_stage))
+    # Make sure to flush to disk so the file is always up to date
+    csvfile.flush()
+    # The uploader streams the small rollups; the full CSV goes up once at the end
+    for rollup in rollups:
+        rollup.add(stats, current_stage)
+
+def main():
+    global benchmark_processes, placement_file
+
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description='Two-stage thermal test with LED control')
+    parser.add_argument('--stage-one', type=float, default=2.0,
+                        help='Duration of stage one (without LEDs) in hours (default: 2.0)')
+    parser.add_argument('--stage-two', type=float, default=2.0,
+                        help='Duration of stage two (with LEDs) in hours (default: 2.0)')
+    # Passed as an argument because sudo drops the caller's environment
+    parser.add_argument('--log-dir', default=LOG_DIR,
+                        help=f'Directory for burn_test.csv and its rollups (default: {LOG_DIR})')
+    args = parser.parse_args()
+    log_dir = args.log_dir
+
+    # Convert hours to seconds
+    STAGE_ONE_DURATION = int(args.stage_one * 3600)  # Convert hours to seconds
+    STAGE_TWO_DURATION = int(args.stage_two * 3600)  # Convert hours to seconds
+    TOTAL_DURATION = STAGE_ONE_DURATION + STAGE_TWO_DURATION
+
+    # Change to the script's directory to ensure all relative paths work
+    os.chdir(SCRIPT_DIR)
+
+    log(f"Starting TWO-STAGE THERMAL TEST")
+    log(f"STAGE 0: {args.stage_one:.1f} hours WITHOUT LEDs")
+    log(f"STAGE 1: {args.stage_two:.1f} hours WITH LEDs")
+    log(f"LOGGING TO CSV EVERY {LOG_INTERVAL} SECONDS")
+
+    signal.signal(signal.SIGINT, signal_handler)
+
+    # Create a fixed filename for the CSV log in our unified log directory
+    csv_filename = os.path.join(log_dir, "burn_test.csv")
+    log(f"SAVING CSV TO {csv_filename}")
+
+    # Create logs directory if it doesn't exist
+    os.makedirs(log_dir, exist_ok=True)
+
+    # This process is the sampler: keep it on the measurement CPUs
+    placement_file = os.path.join(log_dir, "placement.json")
+    placement_record['sampler'] = placement.apply(placement_policy, 'measure')
+    log(f"Sampler placed as {placement.summary(placement_record['sampler'])}")
+    save_placement()
+
+    # Start the CPU and GPU benchmarks
+    benchmark_processes = start_cpu_gpu_benchmark(TOTAL_DURATION)
+    led_process = None
+
+    # Make sure LEDs are off at the beginning
+    turn_off_leds()
+
+    # 1 and 10 minute min/mean/max rollups next to the full CSV
+    rollups = open_rollups(log_dir, FIELDNAMES[2:])
+
+    # Open CSV file for writing
+    with open(csv_filename, mode='w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+
+        # Write header to CSV
+        writer.writeheader()
+
+        start_time = time.time()
+        last_update_time = time.time()
+        current_stage = 0
+
+        # Use jtop to monitor the Jetson stats
+        with jtop() as jetson:
+            while jetson.ok():
+                current_time = time.time()
+                elapsed_time = current_time - start_time
+
+                # Check if we need to switch to stage 1
+                if current_stage == 0 and elapsed_time >= STAGE_ONE_DURATION:
+                    log("--- SWITCHING TO STAGE 1: WITH LEDS ---")
+                    current_stage = 1
+                    led_process = start_led_benchmark()
+                    if led_process:
+                        benchmark_processes.append(led_process)
+
+                # Check if test is complete
+                if elapsed_time >= TOTAL_DURATION:
+                    break
+
+                # Get stats from jetson
+                stats = jetson.stats
+
+                # Log the data with stage information
+                write_sample(writer, csvfile, stats, current_stage, rollups)
+
+                # Sleep to control logging frequency
+                time.sleep(LOG_INTERVAL)
+
+                # Periodic status updates
+                if current_time - last_update_time > 300:  # Update every 5 minutes
+                    last_update_time = current_time
+                    hours_elapsed = elapsed_time / 3600
+                    hours_total = TOTAL_DURATION / 3600
+                    stage_name = "WITHOUT LEDs" if current_stage == 0 else "WITH LEDs"
+                    log(f"Status: STAGE {current_stage} ({stage_name})")
+                    log(f"Time elapsed: {hours_elapsed:.2f} hours / {hours_total:.2f} hours total")
+                    log(f"Junction temp: {stats.get('Temp tj', 'N/A')}°C, Fan: {stats.get('Fan pwmfan0', 'N/A')}%")
+
+    for rollup in rollups:
+        rollup.close()
+
+    log("Test completed!")
+    log(f"CSV file saved to {csv_filename}")
+    log("Stopping stress tools...")
+
+    # Stop all benchmarks
+    stop_benchmark()
+
+    # Make sure LEDs are off at the end
+    turn_off_leds()
+
+    log("✅ GPU burn test finished successfully")
+
+if __name__ == "__main__":
+    main()
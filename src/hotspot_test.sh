@@ -13,15 +13,19 @@ log "Starting hotspot test"
 HOST_SSID=$(hostname)  # gives "truffle-xxxx"
 CONN_NAME="${HOST_SSID}-hotspot"
 HOTSPOT_PSK="runescape"
-HOTSPOT_DURATION=1800  # 30 minutes for hotspot
-WIFI_DURATION=300    # 5 minutes for wifi connection
+HOTSPOT_DURATION=${HOTSPOT_DURATION:-1800}  # 30 minutes for hotspot
+WIFI_DURATION=${WIFI_DURATION:-300}    # 5 minutes for wifi connection
+NMCLI=${NMCLI:-nmcli}
+
+# Event-driven waits on NetworkManager state (exit 1 on timeout)
+NETWATCH="python3 $(dirname "$(readlink -f "$0")")/netwatch.py"
 
 # Secondary wifi from stage0.sh
 SECONDARY_SSID="TP_LINK_AP_E732"
 SECONDARY_PSK="95008158"
 
 # Find Wi-Fi interface
-IFACE=$(sudo nmcli -t -f DEVICE,TYPE device status | awk -F: '$2=="wifi"{print $1; exit}')
+IFACE=$(sudo "$NMCLI" -t -f DEVICE,TYPE device status | awk -F: '$2=="wifi"{print $1; exit}')
 if [[ -z "$IFACE" ]]; then
     log "❌ No Wi-Fi interface found"
     exit 1
@@ -50,34 +54,40 @@ client_connected() {
     return 1
 }
 
+# Helper: seconds left in a window, capped at a check interval
+next_wait() {
+    local remaining=$(( $1 - $2 ))
+    echo $(( remaining < $3 ? remaining : $3 ))
+}
+
 # Helper: get signal strength of current wifi connection
 get_signal_strength() {
     local ssid="$1"
-    sudo nmcli device wifi list ifname "$IFACE" | grep "$ssid" | awk '{print $6}' | head -1
+    sudo "$NMCLI" device wifi list ifname "$IFACE" | grep "$ssid" | awk '{print $6}' | head -1
 }
 
 # Step 1: Save and tear down current connection
 log "Step 1: Tearing down current network connection"
-CURRENT_CONN=$(sudo nmcli -t -f NAME,DEVICE connection show --active | awk -F: -v dev="$IFACE" '$2==dev{print $1}')
+CURRENT_CONN=$(sudo "$NMCLI" -t -f NAME,DEVICE connection show --active | awk -F: -v dev="$IFACE" '$2==dev{print $1}')
 if [[ -n "$CURRENT_CONN" ]]; then
     log "Disconnecting from: $CURRENT_CONN"
-    sudo nmcli connection down "$CURRENT_CONN"
+    sudo "$NMCLI" connection down "$CURRENT_CONN"
 else
     log "No active WiFi connection found"
 fi
 
 # Clean up any existing hotspot connection
-if sudo nmcli connection show | grep -q "$CONN_NAME"; then
+if sudo "$NMCLI" connection show | grep -q "$CONN_NAME"; then
     log "Removing existing hotspot connection: $CONN_NAME"
-    sudo nmcli connection delete "$CONN_NAME" || true
+    sudo "$NMCLI" connection delete "$CONN_NAME" || true
 fi
 
 # Step 2: Start hotspot and monitor for specified duration
 log "Step 2: Starting hotspot '$HOST_SSID' for $((HOTSPOT_DURATION/60)) minutes"
-sudo nmcli device wifi hotspot ifname "$IFACE" ssid "$HOST_SSID" password "$HOTSPOT_PSK" con-name "$CONN_NAME"
+sudo "$NMCLI" device wifi hotspot ifname "$IFACE" ssid "$HOST_SSID" password "$HOTSPOT_PSK" con-name "$CONN_NAME"
 
 log "Hotspot active - monitoring for connections"
-sudo nmcli -f NAME,UUID,TYPE,DEVICE connection show --active | grep -i "$CONN_NAME" || true
+sudo "$NMCLI" -f NAME,UUID,TYPE,DEVICE connection show --active | grep -i "$CONN_NAME" || true
 
 # Monitor hotspot for specified duration
 start_time=$(date +%s)
@@ -97,26 +107,36 @@ while true; do
         log "Monitoring hotspot '$HOST_SSID' - no clients connected (${elapsed}s/${HOTSPOT_DURATION}s)"
     fi
     
-    sleep 30
+    # Wake as soon as a client joins or leaves instead of sleeping a fixed 30s
+    wait_s=$(next_wait "$HOTSPOT_DURATION" "$elapsed" 30)
+    if client_connected; then
+        $NETWATCH wait no-client --iface "$IFACE" --timeout "$wait_s" >/dev/null || true
+    else
+        $NETWATCH wait client --iface "$IFACE" --timeout "$wait_s" >/dev/null || true
+    fi
 done
 
 log "Hotspot phase completed - connected clients during test: $connected_clients"
 
 # Step 3: Tear down hotspot
 log "Step 3: Tearing down hotspot"
-sudo nmcli connection down "$CONN_NAME" || true
-sudo nmcli connection delete "$CONN_NAME" || true
+sudo "$NMCLI" connection down "$CONN_NAME" || true
+sudo "$NMCLI" connection delete "$CONN_NAME" || true
 
 # Step 4: Connect to secondary WiFi network
 log "Step 4: Connecting to secondary WiFi: $SECONDARY_SSID"
-if sudo nmcli device wifi connect "$SECONDARY_SSID" password "$SECONDARY_PSK" ifname "$IFACE"; then
+if sudo "$NMCLI" device wifi connect "$SECONDARY_SSID" password "$SECONDARY_PSK" ifname "$IFACE"; then
     log "✅ Connected to $SECONDARY_SSID"
+    if ! $NETWATCH wait connected --ssid "$SECONDARY_SSID" --iface "$IFACE" --timeout 30 >/dev/null; then
+        log "⚠️ $SECONDARY_SSID associated but no IP address after 30s"
+    fi
     
     # Monitor connection for specified duration
     log "Monitoring WiFi connection for $((WIFI_DURATION/60)) minutes"
     start_time=$(date +%s)
     connection_checks=0
     successful_checks=0
+    reconnect_failures=0
     
     while true; do
         current_time=$(date +%s)
@@ -129,16 +149,29 @@ if sudo nmcli device wifi connect "$SECONDARY_SSID" password "$SECONDARY_PSK" if
         connection_checks=$((connection_checks + 1))
         
         # Check if still connected
-        if sudo nmcli -t -f NAME,DEVICE connection show --active | grep -q "$SECONDARY_SSID"; then
+        if sudo "$NMCLI" -t -f NAME,DEVICE connection show --active | grep -q "$SECONDARY_SSID"; then
             successful_checks=$((successful_checks + 1))
             signal_strength=$(get_signal_strength "$SECONDARY_SSID")
             log "✅ Connected to $SECONDARY_SSID - Signal: ${signal_strength:-N/A} (${elapsed}s/${WIFI_DURATION}s)"
         else
             log "❌ Lost connection to $SECONDARY_SSID - attempting reconnect"
-            sudo nmcli device wifi connect "$SECONDARY_SSID" password "$SECONDARY_PSK" ifname "$IFACE" || true
+            if sudo "$NMCLI" device wifi connect "$SECONDARY_SSID" password "$SECONDARY_PSK" ifname "$IFACE"; then
+                reconnect_failures=0
+            else
+                # Still disconnected, so `wait disconnected` would return at once:
+                # wait to come back instead, backing off 5s, 10s, 20s, 40s, then 60s
+                reconnect_failures=$((reconnect_failures + 1))
+                backoff=$(( reconnect_failures >= 5 ? 60 : 5 << (reconnect_failures - 1) ))
+                wait_s=$(next_wait "$WIFI_DURATION" "$elapsed" "$backoff")
+                log "Reconnect failed, next check in up to ${wait_s}s"
+                $NETWATCH wait connected --ssid "$SECONDARY_SSID" --iface "$IFACE" --timeout "$wait_s" >/dev/null || true
+                continue
+            fi
         fi
         
-        sleep 60  # Check every minute
+        # Check every minute, or immediately if the link drops
+        wait_s=$(next_wait "$WIFI_DURATION" "$elapsed" 60)
+        $NETWATCH wait disconnected --iface "$IFACE" --timeout "$wait_s" >/dev/null || true
     done
     
     connection_stability=$((successful_checks * 100 / connection_checks))
@@ -151,7 +184,7 @@ fi
 # Step 5: Restore original connection if possible
 if [[ -n "$CURRENT_CONN" ]]; then
     log "Step 5: Attempting to restore original connection: $CURRENT_CONN"
-    if sudo nmcli connection up "$CURRENT_CONN"; then
+    if sudo "$NMCLI" connection up "$CURRENT_CONN"; then
         log "✅ Restored connection to $CURRENT_CONN"
     else
         log "❌ Failed to restore original connection"
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import json
 import os
 import subprocess
 import sys
@@ -9,14 +10,44 @@ import requests
 import socket
 from pathlib import Path
 from datetime import datetime
+from netwatch import NMCLI, NetworkWatcher, connected_to, jittered_backoff
+from tracing import enable_from_env, span, traced
+import metrics
+import placement
+from rollup import stream_path
+import runlogs
+import timeline
+from uploadgate import PRIORITY_FINAL, PRIORITY_LIVE, PRIORITY_STAGE, UploadGate
 
 #qa starts heres
 
 #log fille
-LOG_DIR = "/home/truffle/qa_logs"
-BACKEND_URL = "https://649025862b65.ngrok.app/qa/upload"
-BACKEND_API_URL = "https://649025862b65.ngrok.app/qa"
+# QA_* overrides let the simulation harness in sim/ point us at a local backend
+LOG_DIR = os.environ.get("QA_LOG_DIR", "/home/truffle/qa_logs")
+BACKEND_BASE_URL = os.environ.get("QA_BACKEND_URL", "https://649025862b65.ngrok.app")
+BACKEND_URL = f"{BACKEND_BASE_URL}/qa/upload"
+BACKEND_API_URL = f"{BACKEND_BASE_URL}/qa"
 STREAM_INTERVAL = 10  # seconds
+# Backend upload cap shared by every stream (KB/s, 0 = unlimited), see uploadgate.py
+UPLOAD_KBPS = float(os.environ.get("QA_UPLOAD_KBPS", "256"))
+# Live tails while the hotspot test is measuring the link (KB/s, 0 = hold them)
+UPLOAD_SENSITIVE_KBPS = float(os.environ.get("QA_UPLOAD_SENSITIVE_KBPS", "16"))
+
+upload_gate = UploadGate(rate=UPLOAD_KBPS * 1024, sensitive_rate=UPLOAD_SENSITIVE_KBPS * 1024)
+
+# This run's directory under LOG_DIR/runs, set by main(); see runlogs.py
+run_log = None
+
+# Which CPUs/priorities stress vs. measurement and upload work get, see placement.py;
+# what was actually applied goes under 'placement' in run.json
+placement_policy = placement.load_policy()
+placements = {}
+# record_placement is called from the upload, runlogs and stage 5 test threads
+placements_lock = threading.Lock()
+
+# (path, size, mtime) of the gpuTestGraph last sent per stream; the streamed
+# rollup only grows once a minute, so most live uploads can leave it out
+graph_sent = {}
 
 # Stage mapping to backend enums
 STAGE_MAPPING = {
@@ -28,13 +59,21 @@ STAGE_MAPPING = {
     5: "final"
 }
 
+def stage_log_dir(stage_number):
+    """Where a stage's logs live: LOG_DIR/runs/<run>/stage<N>_<name> during a
+    run, plain LOG_DIR when the functions are used without one (sim, bench)"""
+    if run_log is None:
+        return LOG_DIR
+    return run_log.stage_dir(stage_number, STAGE_MAPPING.get(stage_number, "setup"))
+
 def get_hostname():
     """Get the truffle hostname"""
     try:
-        return socket.gethostname()
+        return os.environ.get("QA_HOSTNAME") or socket.gethostname()
     except:
         return "truffle-unknown"
 
+@traced
 def get_current_stage():
     """Get current stage from backend for this device"""
     hostname = get_hostname()
@@ -57,10 +96,12 @@ def get_current_stage():
         print(f"❌ Error getting stage from backend: {e}")
         return 0
 
+@traced
 def update_stage(stage_number):
     """Update stage in backend for this device"""
     hostname = get_hostname()
     stage_name = STAGE_MAPPING.get(stage_number, "setup")
+    metrics.set_stage(stage_number, stage_name)
     
     try:
         # Send stage update in the file upload request
@@ -70,7 +111,11 @@ def update_stage(stage_number):
         }
         
         files = {"_": ("", "")}
-        response = requests.post(BACKEND_URL, data=data, files=files, timeout=10)
+        upload_gate.acquire(PRIORITY_STAGE, 'stage')
+        try:
+            response = requests.post(BACKEND_URL, data=data, files=files, timeout=10)
+        finally:
+            upload_gate.release()
         if response.status_code == 200:
             print(f"📡 Updated backend stage to: {stage_name}")
             return True
@@ -81,11 +126,20 @@ def update_stage(stage_number):
         print(f"❌ Error updating stage: {e}")
         return False
 
-def upload_log_file(log_filename, param_name, current_stage=None):
-    """Upload the current log file to backend (simple one-time upload)"""
+@traced
+@metrics.observed_upload
+def upload_log_file(log_filename, param_name, current_stage=None, final=False, cancel=None):
+    """Upload the current log file to backend (simple one-time upload).
+    GPU streams send the 1 minute rollup means while running, only when they
+    changed since the last send, and the full CSV when final.
+    Waits its turn at upload_gate; returns None if cancel is set while waiting."""
     hostname = get_hostname()
-    log_path = os.path.join(LOG_DIR, log_filename)
-    csv_path = os.path.join(LOG_DIR, "burn_test.csv")  # GPU burn test CSV
+    log_dir = stage_log_dir(current_stage)
+    log_path = os.path.join(log_dir, log_filename)
+    csv_path = os.path.join(log_dir, "burn_test.csv")  # GPU burn test CSV
+    if not final and os.path.exists(stream_path(log_dir)):
+        csv_path = stream_path(log_dir)
+    graph_stamp = None
     
     try:
         files = {}
@@ -97,18 +151,37 @@ def upload_log_file(log_filename, param_name, current_stage=None):
             data['stage'] = stage_name
         
         # Always upload the main log file if it exists
-        if os.path.exists(log_path):
-            with open(log_path, 'rb') as f:
-                files[param_name] = (log_filename, f.read(), 'text/plain')
-        
         # For GPU tests, also upload the CSV file if it exists
+        sources = []
+        if os.path.exists(log_path):
+            sources.append((param_name, log_path, log_filename, 'text/plain'))
         if "gpu" in param_name.lower() and os.path.exists(csv_path):
-            with open(csv_path, 'rb') as f:
-                files['gpuTestGraph'] = ('burn_test.csv', f.read(), 'text/csv')
+            st = os.stat(csv_path)
+            graph_stamp = (csv_path, st.st_size, st.st_mtime_ns)
+            if final or graph_sent.get(param_name) != graph_stamp:
+                sources.append(('gpuTestGraph', csv_path, os.path.basename(csv_path), 'text/csv'))
         
-        if files:
-            response = requests.post(BACKEND_URL, files=files, data=data, timeout=30)
+        if sources:
+            priority = PRIORITY_FINAL if final else PRIORITY_LIVE
+            nbytes = sum(os.path.getsize(path) for _, path, _, _ in sources)
+            deferred = upload_gate.acquire(priority, param_name, nbytes, cancel)
+            if deferred is None:
+                print(f"⏭️ Dropped live upload of {log_filename}, stream stopped while it waited")
+                return None
+            try:
+                if deferred >= STREAM_INTERVAL:
+                    print(f"⏸️ Upload of {log_filename} deferred {deferred:.0f}s")
+                # Read only once it's our turn so the newest content goes up
+                for field, path, filename, content_type in sources:
+                    with open(path, 'rb') as f:
+                        files[field] = (filename, f.read(), content_type)
+                with metrics.timed_request(param_name):
+                    response = requests.post(BACKEND_URL, files=files, data=data, timeout=30)
+            finally:
+                upload_gate.release()
             if response.status_code == 200:
+                if 'gpuTestGraph' in files:
+                    graph_sent[param_name] = None if final else graph_stamp
                 file_list = list(files.keys())
                 print(f"📤 Uploaded {', '.join(file_list)} to backend")
                 return True
@@ -125,10 +198,17 @@ def upload_log_file(log_filename, param_name, current_stage=None):
 
 def periodic_upload_worker(log_filename, param_name, stop_event, current_stage=None):
     """Worker that uploads log file every STREAM_INTERVAL seconds"""
-    while not stop_event.is_set():
-        upload_log_file(log_filename, param_name, current_stage)
-        # Wait for the interval or until stop is requested
-        stop_event.wait(STREAM_INTERVAL)
+    upload_placement = placement.apply(placement_policy, 'upload', threading.get_native_id())
+    if 'upload' not in placements:
+        record_placement('upload', upload_placement)
+    metrics.stream_started()
+    try:
+        while not stop_event.is_set():
+            upload_log_file(log_filename, param_name, current_stage, cancel=stop_event)
+            # Wait for the interval or until stop is requested
+            stop_event.wait(STREAM_INTERVAL)
+    finally:
+        metrics.stream_stopped()
 
 def start_periodic_upload(log_filename, param_name, current_stage=None):
     """Start periodic uploading of a log file in a background thread"""
@@ -141,14 +221,51 @@ def start_periodic_upload(log_filename, param_name, current_stage=None):
     upload_thread.start()
     return stop_event
 
+def record_placement(key, record):
+    """Keep what a placement came to under 'placement' in run.json"""
+    with placements_lock:
+        placements[key] = record
+        # A copy, and written under the lock so an older one can't land last
+        if run_log is not None:
+            run_log.write_meta(placement=dict(placements))
+
+def record_script_placement(current_stage):
+    """Copy burn_test.py's placement.json into run.json; a missing or bad file
+    is logged, it doesn't fail a script that passed"""
+    script_placement = os.path.join(stage_log_dir(current_stage), "placement.json")
+    try:
+        with open(script_placement) as f:
+            record_placement(f"stage{current_stage}", json.load(f))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read {script_placement}: {e}")
+
+def record_upload_deferred():
+    """Keep each stream's total wait at the upload gate under 'upload_deferred' in run.json"""
+    if run_log is None:
+        return
+    totals = upload_gate.deferred_totals()
+    try:
+        run_log.write_meta(upload_deferred={stream: round(seconds, 1) for stream, seconds in totals.items()})
+    except OSError as e:
+        print(f"⚠️ Could not record upload deferral: {e}")
+
+def place_log_maintenance():
+    """Runs in runlogs' background thread, which would otherwise inherit the
+    measurement placement while it gzips old runs"""
+    record_placement('log_maintenance', placement.apply(placement_policy, 'upload', threading.get_native_id()))
+
 def setup_logging():
     """Create log directory structure"""
     os.makedirs(LOG_DIR, exist_ok=True)
     print(f"Log directory set up at: {LOG_DIR}")
 
-def run_script_with_logging(script_path, log_filename, script_args=None, script_type="bash", stream_param=None, current_stage=None):
-    """Run a script and capture its output to a log file with optional streaming"""
-    log_path = os.path.join(LOG_DIR, log_filename)
+@traced
+def run_script_with_logging(script_path, log_filename, script_args=None, script_type="bash", stream_param=None, current_stage=None, network_sensitive=False):
+    """Run a script and capture its output to a log file with optional streaming.
+    network_sensitive slows every live upload down while the script runs."""
+    log_path = os.path.join(stage_log_dir(current_stage), log_filename)
     script_abs_path = os.path.abspath(script_path)
     
     if not os.path.exists(script_abs_path):
@@ -157,6 +274,10 @@ def run_script_with_logging(script_path, log_filename, script_args=None, script_
     
     print(f"Running {script_abs_path} -> {log_path}")
     
+    if network_sensitive:
+        print(f"⏸️ Throttling live uploads while {script_path} measures the network")
+        upload_gate.pause(log_filename)
+    
     # Start periodic uploading if requested
     upload_stop_event = None
     if stream_param:
@@ -166,7 +287,10 @@ def run_script_with_logging(script_path, log_filename, script_args=None, script_
     try:
         with open(log_path, 'w') as log_file:
             log_file.write(f"=== {log_filename} - Started at {datetime.now()} ===\n")
-            
+            # Out of our buffer before the child writes to the same fd,
+            # otherwise the header lands after the script's output
+            log_file.flush()
+
             # Set LOG_FILE environment variable for the script
             env = os.environ.copy()
             env['LOG_FILE'] = log_path
@@ -191,15 +315,23 @@ def run_script_with_logging(script_path, log_filename, script_args=None, script_
             
             log_file.write(f"\n=== Completed at {datetime.now()} with exit code {result.returncode} ===\n")
         
+        # burn_test.py leaves where it put its stress tools next to its CSV
+        if os.path.basename(script_path) == "burn_test.py":
+            record_script_placement(current_stage)
+        
         # Stop uploading
         if upload_stop_event:
             upload_stop_event.set()
             print(f"📡 Stopped periodic upload for {log_filename}")
+        # After the stop, so this stream's own held-back tail is dropped, not sent
+        if network_sensitive:
+            upload_gate.resume(log_filename)
             
         # Final upload to ensure we capture the complete log
         if stream_param:
             print(f"📡 Final upload for {log_filename}")
-            upload_log_file(log_filename, stream_param, current_stage)
+            upload_log_file(log_filename, stream_param, current_stage, final=True)
+        record_upload_deferred()
             
         if result.returncode == 0:
             print(f"✅ {script_path} completed successfully")
@@ -212,13 +344,25 @@ def run_script_with_logging(script_path, log_filename, script_args=None, script_
         # Stop uploading on error
         if upload_stop_event:
             upload_stop_event.set()
+        if network_sensitive:
+            upload_gate.resume(log_filename)
         # Final upload to capture any partial logs
         if stream_param:
             print(f"📡 Final upload for {log_filename} (after error)")
-            upload_log_file(log_filename, stream_param, current_stage)
+            upload_log_file(log_filename, stream_param, current_stage, final=True)
+        record_upload_deferred()
         print(f"❌ Error running {script_path}: {e}")
         return False
 
+def build_timeline(stage_dir):
+    """Merge a stage's logs and burn_test.csv into one indexed timeline.
+    Pass or fail, the run goes on without it."""
+    try:
+        path, count = timeline.build(stage_dir)
+        print(f"🧵 Merged {count} events into {path}")
+    except Exception as e:
+        print(f"⚠️ Timeline not built for {stage_dir}: {e}")
+
 def run_parallel_tests(test_configs):
     """Run multiple tests in parallel and return results"""
     threads = []
@@ -232,13 +376,19 @@ def run_parallel_tests(test_configs):
         script_type = config.get('script_type', 'bash')
         stream_param = config.get('stream_param', None)
         current_stage = config.get('current_stage', None)
+        network_sensitive = config.get('network_sensitive', False)
         
         print(f"Starting {name} in parallel...")
-        success = run_script_with_logging(script_path, log_filename, script_args, script_type, stream_param, current_stage)
+        metrics.set_test_status(name, 'running')
+        success = run_script_with_logging(script_path, log_filename, script_args, script_type, stream_param, current_stage, network_sensitive)
         results[name] = success
+        metrics.set_test_status(name, 'passed' if success else 'failed')
         status = "✅ completed" if success else "❌ failed"
         print(f"{name} {status}")
     
+    for config in test_configs:
+        metrics.set_test_status(config['name'], 'pending')
+    
     # Start all tests in parallel
     for config in test_configs:
         thread = threading.Thread(target=run_test_thread, args=(config,))
@@ -252,6 +402,7 @@ def run_parallel_tests(test_configs):
     
     return results
 
+@traced
 def reconnect_to_primary_wifi():
     """Reconnect to primary WiFi network after hotspot test"""
     PRIMARY_SSID = "itsalltruffles"
@@ -260,32 +411,47 @@ def reconnect_to_primary_wifi():
     
     print(f"🔄 Attempting to reconnect to {PRIMARY_SSID}...")
     
+    def set_autoconnect_priority():
+        subprocess.run([
+            NMCLI, 'con', 'modify', PRIMARY_SSID, 
+            'connection.autoconnect-priority', '0'
+        ], capture_output=True)
+    
     try:
-        # Try to connect to primary WiFi with retries
-        for attempt in range(1, 4):  # 3 attempts
-            print(f"→ Connection attempt {attempt}/3")
-            
-            # Use nmcli to connect
-            result = subprocess.run([
-                'nmcli', '--wait', '10', 'device', 'wifi', 'connect', 
-                PRIMARY_SSID, 'password', PRIMARY_PSK, 'ifname', WIFI_IF
-            ], capture_output=True, text=True, timeout=15)
+        with NetworkWatcher(WIFI_IF) as watcher:
+            # NetworkManager may already have autoconnected once the hotspot went down
+            if watcher.wait_for(connected_to(PRIMARY_SSID), timeout=2):
+                print(f"✅ Already connected to {PRIMARY_SSID}")
+                set_autoconnect_priority()
+                return True
             
-            if result.returncode == 0:
-                print(f"✅ Successfully connected to {PRIMARY_SSID} on attempt {attempt}")
+            # Try to connect to primary WiFi with retries
+            for attempt in range(1, 4):  # 3 attempts
+                print(f"→ Connection attempt {attempt}/3")
                 
-                # Set autoconnect priority after successful connection
-                subprocess.run([
-                    'nmcli', 'con', 'modify', PRIMARY_SSID, 
-                    'connection.autoconnect-priority', '0'
-                ], capture_output=True)
+                # Use nmcli to connect
+                result = subprocess.run([
+                    NMCLI, '--wait', '10', 'device', 'wifi', 'connect', 
+                    PRIMARY_SSID, 'password', PRIMARY_PSK, 'ifname', WIFI_IF
+                ], capture_output=True, text=True, timeout=15)
                 
-                return True
-            else:
-                print(f"❌ Attempt {attempt} failed: {result.stderr.strip()}")
+                # nmcli returning 0 doesn't guarantee DHCP is done, wait for an address
+                if result.returncode == 0 and watcher.wait_for(connected_to(PRIMARY_SSID), timeout=15):
+                    print(f"✅ Successfully connected to {PRIMARY_SSID} on attempt {attempt}")
+                    
+                    # Set autoconnect priority after successful connection
+                    set_autoconnect_priority()
+                    return True
+                
+                print(f"❌ Attempt {attempt} failed: {result.stderr.strip() or 'no IP address'}")
                 if attempt < 3:
-                    print("→ Waiting 5 seconds before retry...")
-                    time.sleep(5)
+                    # Back off, but wake early if NetworkManager connects on its own
+                    delay = jittered_backoff(attempt, base=4, cap=15)
+                    print(f"→ Waiting up to {delay:.1f}s for network before retry...")
+                    if watcher.wait_for(connected_to(PRIMARY_SSID), timeout=delay):
+                        print(f"✅ NetworkManager reconnected to {PRIMARY_SSID}")
+                        set_autoconnect_priority()
+                        return True
         
         print(f"❌ Failed to reconnect to {PRIMARY_SSID} after 3 attempts")
         return False
@@ -298,9 +464,22 @@ def reconnect_to_primary_wifi():
         return False
 
 def main():
+    global run_log
     print("=== QA Test Suite Starting ===")
+    # Before any thread starts: affinity and nice are per thread and inherited
+    main_placement = placement.apply(placement_policy, 'measure')
+    print(f"📌 {placement.summary(main_placement)}")
     
     setup_logging()
+    # Fresh directory per run; older runs get compressed and pruned in the background
+    run_log = runlogs.start_run(LOG_DIR, get_hostname(), on_start=place_log_maintenance)
+    print(f"🗂️ Logging this run to {run_log.dir}")
+    record_placement('policy', placement_policy)
+    record_placement('main', main_placement)
+    # QA_TRACE=1 records spans to the run's trace.jsonl and prints a summary on exit
+    enable_from_env(os.path.join(run_log.dir, "trace.jsonl"))
+    # QA_METRICS_PORT=9102 serves live Prometheus metrics for station dashboards
+    metrics.start_from_env(LOG_DIR, get_hostname())
     
     # Get current stage from backend to resume from where we left off
     start_stage = get_current_stage()
@@ -323,128 +502,135 @@ def main():
     
     #Stage 1: LED Test
     if start_stage <= 1:
-        print("\n--- Stage 1: LED Test ---")
-        update_stage(1)  # Update backend that we're starting LED test
-        success = run_script_with_logging("led_test.sh", "led_test.txt", stream_param="ledTestFile", current_stage=1)
+        with span("stage 1: led"):
+            print("\n--- Stage 1: LED Test ---")
+            update_stage(1)  # Update backend that we're starting LED test
+            success = run_script_with_logging("led_test.sh", "led_test.txt", stream_param="ledTestFile", current_stage=1)
         
-        if not success:
-            print("❌ LED test failed, stopping test suite")
-            sys.exit(1)
+            if not success:
+                print("❌ LED test failed, stopping test suite")
+                sys.exit(1)
         
-        update_stage(2)  # Move to next stage
-        print("✅ Stage 1 completed - Updated backend to NVME stage")
+            update_stage(2)  # Move to next stage
+            print("✅ Stage 1 completed - Updated backend to NVME stage")
     else:
         print("⏭️ Skipping Stage 1 (already completed)")
     
     # Stage 2: NVME Test
     if start_stage <= 2:
-        print("\n--- Stage 2: NVME Test ---")
-        update_stage(2)  # Update backend that we're starting NVME test
-        success = run_script_with_logging("nvme_test.sh", "nvme_test.txt", stream_param="nvmeTestFile", current_stage=2)
+        with span("stage 2: nvme"):
+            print("\n--- Stage 2: NVME Test ---")
+            update_stage(2)  # Update backend that we're starting NVME test
+            success = run_script_with_logging("nvme_test.sh", "nvme_test.txt", stream_param="nvmeTestFile", current_stage=2)
         
-        if not success:
-            print("❌ NVME test failed, stopping test suite")
-            sys.exit(1)
+            if not success:
+                print("❌ NVME test failed, stopping test suite")
+                sys.exit(1)
         
-        update_stage(3)  # Move to next stage
-        print("✅ Stage 2 completed - Updated backend to Hotspot stage")
+            update_stage(3)  # Move to next stage
+            print("✅ Stage 2 completed - Updated backend to Hotspot stage")
     else:
         print("⏭️ Skipping Stage 2 (already completed)")
     
     # Stage 3: Hotspot Test
     if start_stage <= 3:
-        print("\n--- Stage 3: Hotspot Test ---")
-        update_stage(3)  # Update backend that we're starting Hotspot test
-        success = run_script_with_logging("hotspot_test.sh", "hotspot_test.txt", stream_param="hotspotTestFile", current_stage=3)
+        with span("stage 3: hotspot"):
+            print("\n--- Stage 3: Hotspot Test ---")
+            update_stage(3)  # Update backend that we're starting Hotspot test
+            success = run_script_with_logging("hotspot_test.sh", "hotspot_test.txt", stream_param="hotspotTestFile", current_stage=3, network_sensitive=True)
         
-        if not success:
-            print("❌ Hotspot test failed, stopping test suite")
-            sys.exit(1)
+            if not success:
+                print("❌ Hotspot test failed, stopping test suite")
+                sys.exit(1)
         
-        # Reconnect to primary WiFi after hotspot test
-        print("🔄 Reconnecting to primary WiFi network after hotspot test...")
-        wifi_reconnect_success = reconnect_to_primary_wifi()
-        if wifi_reconnect_success:
-            print("✅ Successfully reconnected to primary WiFi")
-        else:
-            print("⚠️ Failed to reconnect to primary WiFi, but continuing")
+            # Reconnect to primary WiFi after hotspot test
+            print("🔄 Reconnecting to primary WiFi network after hotspot test...")
+            wifi_reconnect_success = reconnect_to_primary_wifi()
+            if wifi_reconnect_success:
+                print("✅ Successfully reconnected to primary WiFi")
+            else:
+                print("⚠️ Failed to reconnect to primary WiFi, but continuing")
         
-        update_stage(4)  # Move to next stage
-        print("✅ Stage 3 completed - Updated backend to GPU stage")
+            update_stage(4)  # Move to next stage
+            print("✅ Stage 3 completed - Updated backend to GPU stage")
     else:
         print("⏭️ Skipping Stage 3 (already completed)")
     
     # Stage 4: GPU Burn Test
     if start_stage <= 4:
-        print("\n--- Stage 4: GPU Burn Test ---")
-        update_stage(4)  # Update backend that we're starting GPU test
-        burn_args = ["--stage-one", "1", "--stage-two", "1"]
-        success = run_script_with_logging("burn_test.py", "burn_test.txt", burn_args, "python", "gpuTestFile", current_stage=4)
+        with span("stage 4: gpu"):
+            print("\n--- Stage 4: GPU Burn Test ---")
+            update_stage(4)  # Update backend that we're starting GPU test
+            burn_args = ["--stage-one", "1", "--stage-two", "1", "--log-dir", stage_log_dir(4)]
+            success = run_script_with_logging("burn_test.py", "burn_test.txt", burn_args, "python", "gpuTestFile", current_stage=4)
         
-        if not success:
-            print("❌ GPU burn test failed, stopping test suite")
-            sys.exit(1)
+            if not success:
+                print("❌ GPU burn test failed, stopping test suite")
+                sys.exit(1)
         
-        update_stage(5)  # Move to final stage
-        print("✅ Stage 4 completed - Updated backend to Final stage")
+            update_stage(5)  # Move to final stage
+            print("✅ Stage 4 completed - Updated backend to Final stage")
     else:
         print("⏭️ Skipping Stage 4 (already completed)")
     
     # Stage 5: Parallel Stress Test (Final)
     if start_stage <= 5:
-        print("\n--- Stage 5: Final Parallel Stress Test ---")
-        update_stage(5)  # Update backend that we're starting final test
-        print("Running GPU burn test, NVME test, and hotspot test simultaneously...")
+        with span("stage 5: final"):
+            print("\n--- Stage 5: Final Parallel Stress Test ---")
+            update_stage(5)  # Update backend that we're starting final test
+            print("Running GPU burn test, NVME test, and hotspot test simultaneously...")
         
-        parallel_configs = [
-            {
-                'name': 'GPU Burn Test',
-                'script_path': 'burn_test.py',
-                'log_filename': 'stage5_gpu_burn.txt',
-                'script_args': ["--stage-one", "1", "--stage-two", "1"],  # Shorter duration for parallel test
-                'script_type': 'python',
-                'stream_param': 'stage5GpuTestFile',
-                'current_stage': 5
-            },
-            {
-                'name': 'NVME Test',
-                'script_path': 'nvme_test.sh',
-                'log_filename': 'stage5_nvme_test.txt',
-                'script_type': 'bash',
-                'stream_param': 'stage5NvmeTestFile',
-                'current_stage': 5
-            },
-            {
-                'name': 'Hotspot Test',
-                'script_path': 'hotspot_test.sh',
-                'log_filename': 'stage5_hotspot_test.txt',
-                'script_type': 'bash',
-                'stream_param': 'stage5HotspotTestFile',
-                'current_stage': 5
-            }
-        ]
+            parallel_configs = [
+                {
+                    'name': 'GPU Burn Test',
+                    'script_path': 'burn_test.py',
+                    'log_filename': 'stage5_gpu_burn.txt',
+                    'script_args': ["--stage-one", "1", "--stage-two", "1", "--log-dir", stage_log_dir(5)],  # Shorter duration for parallel test
+                    'script_type': 'python',
+                    'stream_param': 'stage5GpuTestFile',
+                    'current_stage': 5
+                },
+                {
+                    'name': 'NVME Test',
+                    'script_path': 'nvme_test.sh',
+                    'log_filename': 'stage5_nvme_test.txt',
+                    'script_type': 'bash',
+                    'stream_param': 'stage5NvmeTestFile',
+                    'current_stage': 5
+                },
+                {
+                    'name': 'Hotspot Test',
+                    'script_path': 'hotspot_test.sh',
+                    'log_filename': 'stage5_hotspot_test.txt',
+                    'script_type': 'bash',
+                    'stream_param': 'stage5HotspotTestFile',
+                    'current_stage': 5,
+                    'network_sensitive': True
+                }
+            ]
         
-        print("⚠️  Note: This test will run for approximately 2+ hours due to GPU burn test duration")
-        results = run_parallel_tests(parallel_configs)
+            print("⚠️  Note: This test will run for approximately 2+ hours due to GPU burn test duration")
+            results = run_parallel_tests(parallel_configs)
+            build_timeline(stage_log_dir(5))
         
-        # Check if all parallel tests passed
-        failed_tests = [name for name, success in results.items() if not success]
-        if failed_tests:
-            print(f"❌ Stage 5 failed - Failed tests: {', '.join(failed_tests)}")
-            sys.exit(1)
-        else:
-            print("✅ Stage 5 completed - All parallel tests passed!")
-            
-            # Reconnect to primary WiFi after final parallel test (includes hotspot)
-            print("🔄 Reconnecting to primary WiFi network after final parallel test...")
-            wifi_reconnect_success = reconnect_to_primary_wifi()
-            if wifi_reconnect_success:
-                print("✅ Successfully reconnected to primary WiFi after final test")
+            # Check if all parallel tests passed
+            failed_tests = [name for name, success in results.items() if not success]
+            if failed_tests:
+                print(f"❌ Stage 5 failed - Failed tests: {', '.join(failed_tests)}")
+                sys.exit(1)
             else:
-                print("⚠️ Failed to reconnect to primary WiFi, but continuing")
+                print("✅ Stage 5 completed - All parallel tests passed!")
+            
+                # Reconnect to primary WiFi after final parallel test (includes hotspot)
+                print("🔄 Reconnecting to primary WiFi network after final parallel test...")
+                wifi_reconnect_success = reconnect_to_primary_wifi()
+                if wifi_reconnect_success:
+                    print("✅ Successfully reconnected to primary WiFi after final test")
+                else:
+                    print("⚠️ Failed to reconnect to primary WiFi, but continuing")
             
-            # Mark as fully complete in backend
-            update_stage(5)
+                # Mark as fully complete in backend
+                update_stage(5)
     else:
         print("⏭️ All stages already completed!")
     
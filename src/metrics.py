@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+#
+# LIVE METRICS
+# Optional Prometheus text endpoint so a station dashboard can scrape
+# every unit instead of waiting for the next full log upload. Off unless
+# QA_METRICS_PORT is set:
+#   QA_METRICS_PORT=9102 python3 main.py
+#   curl http://<truffle>:9102/metrics
+#
+# Exposes the current stage and how long it has been running, per-test
+# status from run_parallel_tests, the upload gate's queue, pauses and
+# deferral time, uploader in-flight/latency counters and the newest
+# burn_test.csv row (read from the tail of the file on scrape, so the
+# sampler is untouched).
+#
+# Standalone, for a log dir copied off a unit:
+#   python3 metrics.py --log-dir ./qa_logs --port 9102
+#
+
+import argparse
+import contextlib
+import csv
+import functools
+import glob
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TEST_STATES = ('pending', 'running', 'passed', 'failed')
+
+# Bytes read from the end of burn_test.csv to find the newest row
+TAIL_BYTES = 4096
+
+_lock = threading.Lock()
+_started = time.time()
+_stage = {'number': None, 'name': None, 'since': None}
+_tests = {}
+_uploads = {}
+_streams_active = 0
+_queue = {'depth': 0, 'paused': 0}
+_deferred = {}
+
+def _upload_entry(stream):
+    return _uploads.setdefault(stream, {
+        'in_flight': 0, 'ok': 0, 'error': 0, 'cancelled': 0, 'requests': 0,
+        'seconds_sum': 0.0, 'last_seconds': 0.0, 'last_success': 0.0,
+    })
+
+def set_stage(number, name):
+    """Record the stage the unit is in; elapsed time restarts only on change"""
+    with _lock:
+        if _stage['number'] != number:
+            _stage.update(number=number, name=name, since=time.time())
+
+def set_test_status(test, state):
+    with _lock:
+        _tests[test] = state
+
+def stream_started():
+    global _streams_active
+    with _lock:
+        _streams_active += 1
+
+def stream_stopped():
+    global _streams_active
+    with _lock:
+        _streams_active -= 1
+
+def set_upload_queue(depth, paused):
+    """Called by the upload gate whenever its queue or pause set changes"""
+    with _lock:
+        _queue.update(depth=depth, paused=paused)
+
+def upload_deferred(stream, seconds):
+    with _lock:
+        _deferred[stream] = _deferred.get(stream, 0.0) + seconds
+
+def observed_upload(func):
+    """Decorator for upload_log_file(log_filename, param_name, ...) counting
+    in-flight uploads and outcomes per stream. Latency comes from
+    timed_request() around the HTTP call, so gate waits aren't in it."""
+    @functools.wraps(func)
+    def wrapper(log_filename, param_name, *args, **kwargs):
+        with _lock:
+            _upload_entry(param_name)['in_flight'] += 1
+        ok = False
+        try:
+            ok = func(log_filename, param_name, *args, **kwargs)
+            return ok
+        finally:
+            with _lock:
+                entry = _upload_entry(param_name)
+                entry['in_flight'] -= 1
+                # None: a live upload dropped at the upload gate, never sent
+                entry['ok' if ok is True else 'cancelled' if ok is None else 'error'] += 1
+                if ok is True:
+                    entry['last_success'] = time.time()
+    return wrapper
+
+@contextlib.contextmanager
+def timed_request(stream):
+    """Time one backend request of a stream (the HTTP call only)"""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        seconds = time.monotonic() - start
+        with _lock:
+            entry = _upload_entry(stream)
+            entry['requests'] += 1
+            entry['seconds_sum'] += seconds
+            entry['last_seconds'] = seconds
+
+def find_burn_csv(log_dir):
+    """Newest burn_test.csv: flat in log_dir, or in a stage dir of the current run"""
+    candidates = [os.path.join(log_dir, "burn_test.csv")]
+    candidates += glob.glob(os.path.join(log_dir, "current", "*", "burn_test.csv"))
+    existing = [path for path in candidates if os.path.exists(path)]
+    return max(existing, key=os.path.getmtime) if existing else None
+
+def latest_telemetry(csv_path):
+    """Newest complete row of a burn_test.csv as {column: value}, or None"""
+    try:
+        with open(csv_path, 'rb') as f:
+            header = f.readline().decode(errors='replace').strip()
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - TAIL_BYTES))
+            lines = f.read().decode(errors='replace').split('\n')
+    except OSError:
+        return None
+    # The sampler may be halfway through a write; only trust whole lines
+    rows = [line for line in lines[:-1] if line.strip() and line.strip() != header]
+    if not header or not rows:
+        return None
+    return next(csv.DictReader([header, rows[-1]]))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _line(out, name, value, **labels):
+    if labels:
+        pairs = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        out.append(f"{name}{{{pairs}}} {value}")
+    else:
+        out.append(f"{name} {value}")
+
+def _meta(out, name, kind, text):
+    out.append(f"# HELP {name} {text}")
+    out.append(f"# TYPE {name} {kind}")
+
+def render(log_dir, hostname):
+    """Everything we know right now, in Prometheus text exposition format"""
+    now = time.time()
+    with _lock:
+        stage = dict(_stage)
+        tests = dict(_tests)
+        uploads = {k: dict(v) for k, v in _uploads.items()}
+        streams_active = _streams_active
+        queue = dict(_queue)
+        deferred = dict(_deferred)
+
+    out = []
+    _meta(out, 'qa_info', 'gauge', 'Unit identity')
+    _line(out, 'qa_info', 1, hostname=hostname)
+    _meta(out, 'qa_uptime_seconds', 'gauge', 'Seconds since the QA service started')
+    _line(out, 'qa_uptime_seconds', f"{now - _started:.3f}")
+
+    if stage['number'] is not None:
+        _meta(out, 'qa_stage', 'gauge', 'Current QA stage number')
+        _line(out, 'qa_stage', stage['number'], stage=stage['name'])
+        _meta(out, 'qa_stage_elapsed_seconds', 'gauge', 'Seconds spent in the current stage')
+        _line(out, 'qa_stage_elapsed_seconds', f"{now - stage['since']:.3f}", stage=stage['name'])
+
+    if tests:
+        _meta(out, 'qa_test_status', 'gauge', 'Parallel test state, 1 for the current state')
+        for test, current in sorted(tests.items()):
+            for state in TEST_STATES:
+                _line(out, 'qa_test_status', 1 if state == current else 0, test=test, state=state)
+
+    _meta(out, 'qa_upload_streams_active', 'gauge', 'Log streams currently uploading every STREAM_INTERVAL')
+    _line(out, 'qa_upload_streams_active', streams_active)
+    _meta(out, 'qa_upload_queue_depth', 'gauge', 'Uploads waiting for the upload gate')
+    _line(out, 'qa_upload_queue_depth', queue['depth'])
+    _meta(out, 'qa_upload_paused', 'gauge', 'Network-sensitive phases currently holding back live uploads')
+    _line(out, 'qa_upload_paused', queue['paused'])
+    if deferred:
+        _meta(out, 'qa_upload_deferred_seconds_total', 'counter', 'Time uploads spent waiting for the gate')
+        for stream, seconds in sorted(deferred.items()):
+            _line(out, 'qa_upload_deferred_seconds_total', f"{seconds:.3f}", stream=stream)
+    if uploads:
+        _meta(out, 'qa_upload_in_flight', 'gauge', 'Uploads started but not finished')
+        for stream, entry in sorted(uploads.items()):
+            _line(out, 'qa_upload_in_flight', entry['in_flight'], stream=stream)
+        _meta(out, 'qa_uploads_total', 'counter', 'Finished uploads by result')
+        for stream, entry in sorted(uploads.items()):
+            _line(out, 'qa_uploads_total', entry['ok'], stream=stream, result='ok')
+            _line(out, 'qa_uploads_total', entry['error'], stream=stream, result='error')
+            _line(out, 'qa_uploads_total', entry['cancelled'], stream=stream, result='cancelled')
+        _meta(out, 'qa_upload_duration_seconds', 'summary', 'Backend request latency, without upload gate waits')
+        for stream, entry in sorted(uploads.items()):
+            _line(out, 'qa_upload_duration_seconds_sum', f"{entry['seconds_sum']:.6f}", stream=stream)
+            _line(out, 'qa_upload_duration_seconds_count', entry['requests'], stream=stream)
+        _meta(out, 'qa_upload_last_duration_seconds', 'gauge', 'Latency of the most recent backend request')
+        for stream, entry in sorted(uploads.items()):
+            _line(out, 'qa_upload_last_duration_seconds', f"{entry['last_seconds']:.6f}", stream=stream)
+        _meta(out, 'qa_upload_last_success_timestamp_seconds', 'gauge', 'Unix time of the last successful upload')
+        for stream, entry in sorted(uploads.items()):
+            _line(out, 'qa_upload_last_success_timestamp_seconds', f"{entry['last_success']:.3f}", stream=stream)
+
+    csv_path = find_burn_csv(log_dir)
+    row = latest_telemetry(csv_path) if csv_path else None
+    if row:
+        _meta(out, 'qa_telemetry', 'gauge', 'Newest burn test sample per jtop channel')
+        for channel, value in row.items():
+            if channel in ('time', 'stage') or value in (None, ''):
+                continue
+            try:
+                _line(out, 'qa_telemetry', float(value), channel=channel)
+            except ValueError:
+                pass
+        try:
+            burn_stage = int(row.get('stage') or 0)
+            _meta(out, 'qa_burn_stage', 'gauge', 'Burn test stage of the newest sample (0 without LEDs, 1 with)')
+            _line(out, 'qa_burn_stage', burn_stage)
+        except ValueError:
+            pass
+        try:
+            sampled = datetime.strptime(row['time'], "%Y-%m-%d %H:%M:%S")
+            _meta(out, 'qa_telemetry_age_seconds', 'gauge', 'Seconds since the newest burn test sample')
+            _line(out, 'qa_telemetry_age_seconds', f"{(datetime.now() - sampled).total_seconds():.0f}")
+        except (KeyError, TypeError, ValueError):
+            pass
+
+    return '\n'.join(out) + '\n'
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render(self.server.log_dir, self.server.hostname).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would drown the QA log
+
+def start_server(log_dir, hostname, port, host='0.0.0.0'):
+    """Serve /metrics from a daemon thread; returns the server"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.log_dir = log_dir
+    server.hostname = hostname
+    thread = threading.Thread(target=server.serve_forever, name='metrics', daemon=True)
+    thread.start()
+    return server
+
+def start_from_env(log_dir, hostname):
+    port = os.environ.get("QA_METRICS_PORT")
+    if not port:
+        return None
+    try:
+        server = start_server(log_dir, hostname, int(port), os.environ.get("QA_METRICS_HOST", "0.0.0.0"))
+    except (OSError, ValueError) as e:
+        # Monitoring must never stop a QA run
+        print(f"⚠️ Metrics endpoint not started on port {port}: {e}")
+        return None
+    print(f"📈 Metrics at http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve QA metrics for a log directory')
+    parser.add_argument('--log-dir', default=os.environ.get("QA_LOG_DIR", "/home/truffle/qa_logs"))
+    parser.add_argument('--port', type=int, default=9102)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--once', action='store_true', help='Print the metrics once and exit')
+    args = parser.parse_args()
+
+    hostname = os.environ.get("QA_HOSTNAME") or os.uname().nodename
+    if args.once:
+        print(render(args.log_dir, hostname), end='')
+        return
+    server = start_server(args.log_dir, hostname, args.port, args.host)
+    print(f"📈 Serving {args.log_dir} at http://{args.host}:{server.server_address[1]}/metrics")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
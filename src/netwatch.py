@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+#
+# NETWORK STATE WATCHER
+# Wakes up on NetworkManager state changes (nmcli monitor) instead of
+# sleeping fixed windows, so callers can wait for conditions such as
+# "connected to SSID X with an IP" or "hotspot client associated".
+#
+# Usable as a module from main.py or from bash:
+#   python3 netwatch.py wait connected --ssid itsalltruffles --timeout 60
+#   python3 netwatch.py wait client --timeout 300
+#
+# Exit code is 0 once the condition holds and 1 on timeout.
+#
+
+import argparse
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+
+# Binaries can be swapped for the fake tools in sim/ when running offline
+NMCLI = os.environ.get("NMCLI", "nmcli")
+IW = os.environ.get("IW", "iw")
+HOSTAPD_CLI = os.environ.get("HOSTAPD_CLI", "hostapd_cli")
+IP = os.environ.get("IP", "ip")
+WIFI_IF = "wlP1p1s0"
+
+def jittered_backoff(attempt, base=1.0, cap=30.0):
+    """Exponential backoff delay for a 1-based attempt, with equal jitter"""
+    delay = min(cap, base * (2 ** (attempt - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def read_state(iface=WIFI_IF):
+    """Snapshot the device state, active connection and IPv4 address"""
+    state = {'iface': iface, 'state': 'unknown', 'connection': '', 'ip': ''}
+    try:
+        result = subprocess.run(
+            [NMCLI, '-t', '-f', 'GENERAL.STATE,GENERAL.CONNECTION,IP4.ADDRESS', 'device', 'show', iface],
+            capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return state
+
+    for line in result.stdout.splitlines():
+        key, _, value = line.partition(':')
+        if key == 'GENERAL.STATE':
+            # e.g. "100 (connected)"
+            if '(' in value:
+                value = value[value.index('(') + 1:value.rindex(')')]
+            state['state'] = value.strip()
+        elif key == 'GENERAL.CONNECTION':
+            state['connection'] = value.strip()
+        elif key.startswith('IP4.ADDRESS') and not state['ip']:
+            state['ip'] = value.strip()
+    return state
+
+MAC_LINE = re.compile(r'^([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}')
+
+def _output(cmd):
+    try:
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return ''
+
+def station_count(iface=WIFI_IF):
+    """Number of clients on our hotspot, checked in the same order as
+    client_connected() in hotspot_test.sh: iw stations, then hostapd_cli,
+    then REACHABLE ARP entries. The two must agree, or the hotspot loop's
+    waits return at once and it spins."""
+    lines = _output([IW, 'dev', iface, 'station', 'dump']).splitlines()
+    count = sum(1 for line in lines if line.startswith('Station'))
+    if count:
+        return count
+    lines = _output([HOSTAPD_CLI, '-i', iface, 'all_sta']).splitlines()
+    count = sum(1 for line in lines if MAC_LINE.match(line))
+    if count:
+        return count
+    lines = _output([IP, 'neigh', 'show', 'dev', iface]).splitlines()
+    return sum(1 for line in lines if 'REACHABLE' in line)
+
+# Conditions take a state snapshot and return True once satisfied
+
+def connected_to(ssid):
+    def condition(state):
+        return state['state'] == 'connected' and state['connection'] == ssid and bool(state['ip'])
+    condition.description = f"connected to {ssid} with an IP"
+    return condition
+
+def disconnected():
+    def condition(state):
+        return state['state'] in ('disconnected', 'unavailable')
+    condition.description = "disconnected"
+    return condition
+
+def hotspot_client_associated():
+    def condition(state):
+        return station_count(state['iface']) > 0
+    condition.description = "hotspot client associated"
+    return condition
+
+def no_hotspot_clients():
+    def condition(state):
+        return station_count(state['iface']) == 0
+    condition.description = "no hotspot clients"
+    return condition
+
+class NetworkWatcher:
+    """Follows `nmcli monitor` in the background and lets callers wait for conditions"""
+
+    def __init__(self, iface=WIFI_IF, poll_cap=5.0):
+        self.iface = iface
+        # Upper bound on how long we trust the monitor before re-checking anyway
+        self.poll_cap = poll_cap
+        self._changed = threading.Event()
+        self._proc = None
+        self._thread = None
+
+    def start(self):
+        try:
+            self._proc = subprocess.Popen(
+                [NMCLI, 'monitor'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True
+            )
+        except OSError as e:
+            print(f"⚠️ nmcli monitor unavailable ({e}), falling back to polling")
+            return self
+        self._thread = threading.Thread(target=self._follow, daemon=True)
+        self._thread.start()
+        return self
+
+    def _follow(self):
+        for _ in self._proc.stdout:
+            self._changed.set()
+
+    def stop(self):
+        if self._proc is not None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+            self._proc = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def wait_for(self, condition, timeout):
+        """Block until condition(state) holds; returns the state, or None on timeout"""
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            # Clear before reading so a change during the read is not lost
+            self._changed.clear()
+            state = read_state(self.iface)
+            if condition(state):
+                return state
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            attempt += 1
+            self._changed.wait(min(remaining, jittered_backoff(attempt, base=0.5, cap=self.poll_cap)))
+
+def main():
+    parser = argparse.ArgumentParser(description='Wait for a NetworkManager state condition')
+    sub = parser.add_subparsers(dest='command', required=True)
+    wait = sub.add_parser('wait', help='Wait for a condition, exit 1 on timeout')
+    wait.add_argument('condition', choices=['connected', 'disconnected', 'client', 'no-client'])
+    wait.add_argument('--ssid', help='SSID for the connected condition')
+    wait.add_argument('--iface', default=WIFI_IF)
+    wait.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+
+    if args.condition == 'connected':
+        if not args.ssid:
+            parser.error('--ssid is required for the connected condition')
+        condition = connected_to(args.ssid)
+    elif args.condition == 'disconnected':
+        condition = disconnected()
+    elif args.condition == 'client':
+        condition = hotspot_client_associated()
+    else:
+        condition = no_hotspot_clients()
+
+    start = time.monotonic()
+    with NetworkWatcher(args.iface) as watcher:
+        state = watcher.wait_for(condition, args.timeout)
+    waited = time.monotonic() - start
+
+    if state is None:
+        print(f"timed out after {waited:.1f}s waiting for {condition.description}")
+        sys.exit(1)
+    print(f"{condition.description} after {waited:.1f}s ({state['ip'] or 'no ip'})")
+
+if __name__ == "__main__":
+    main()
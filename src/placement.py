@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+#
+# CPU PLACEMENT
+# Keeps stress load off the cores and I/O queue the measurements use, per
+# the policy declared in placement.json at the repo root:
+#   measure  main.py, the jtop sampler in burn_test.py and the test scripts
+#            main.py runs (inherited from main.py)
+#   upload   main.py's periodic upload threads and the thread compressing
+#            old runs (runlogs.py)
+#   stress   gpu_burn, stress and the LED load started by burn_test.py
+# Each role may set
+#   cpus        affinity, e.g. "0-1" or "2-" (through the last CPU)
+#   nice        -20..19; going below 0 needs root (qa-test.service runs main.py
+#               as root, a manual run as another user gets its errors recorded)
+#   ionice      "idle", "best-effort:<0-7>" or "realtime:<0-7>"
+#   cpu_weight  cgroup v2 cpu.weight, only with "cgroup_root"
+# and "cgroup_root" (e.g. "/sys/fs/cgroup/qa") puts each role in its own
+# cgroup v2 group with cpuset.cpus set. A CPU set that matches nothing
+# online (a smaller module) leaves affinity alone rather than failing.
+# Child processes are placed between fork and exec, so workers stress forks
+# inherit it. What was actually applied is read back from the kernel for
+# run.json; a setting that didn't take shows up there, it never stops a run.
+#
+#   python3 placement.py             # show the policy against this machine
+#   python3 placement.py --pid 1234  # where a process actually runs
+#
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+
+POLICY_PATH = os.environ.get("QA_PLACEMENT_POLICY",
+                             os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "placement.json"))
+
+IONICE_CLASSES = {'realtime': '1', 'best-effort': '2', 'idle': '3'}
+
+def load_policy(path=POLICY_PATH):
+    """The declared policy, or None (no placement) if there isn't a usable one"""
+    try:
+        with open(path) as f:
+            policy = json.load(f)
+    except OSError:
+        return None
+    except ValueError as e:
+        print(f"⚠️ Ignoring placement policy {path}: {e}")
+        return None
+    policy.setdefault('roles', {})
+    policy['path'] = path
+    return policy
+
+def online_cpus():
+    return set(range(os.cpu_count() or 1))
+
+def parse_cpus(spec, online=None):
+    """"0-1,4" / "2-" -> set of CPU numbers that are online"""
+    online = online_cpus() if online is None else online
+    cpus = set()
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            low, high = part.split('-', 1)
+            cpus.update(range(int(low), int(high) + 1 if high else max(online) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus & online
+
+def format_cpus(cpus):
+    """{0, 1, 2, 5} -> "0-2,5" """
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(f"{a}-{b}" if a != b else str(a) for a, b in ranges)
+
+def _ionice_args(spec):
+    """ionice(1) class/level arguments for "best-effort:4" style specs"""
+    name, _, level = str(spec).partition(':')
+    args = ['-c', IONICE_CLASSES[name]]
+    if level and name != 'idle':
+        args += ['-n', level]
+    return args
+
+def _role(policy, role):
+    return (policy or {}).get('roles', {}).get(role) or {}
+
+def prepare_cgroup(policy, role):
+    """Create <cgroup_root>/<role> with the role's cpuset and weight; returns
+    its path, None without cgroup_root. Raises OSError if cgroups won't have it."""
+    root = (policy or {}).get('cgroup_root')
+    if not root:
+        return None
+    if not os.path.exists(os.path.join(os.path.dirname(root), 'cgroup.controllers')):
+        raise OSError(f"{os.path.dirname(root)} is not a cgroup v2 hierarchy")
+    settings = _role(policy, role)
+    path = os.path.join(root, role)
+    os.makedirs(path, exist_ok=True)
+    # Controllers have to be enabled on every level above the group
+    for parent in (os.path.dirname(root), root):
+        for controller in ('cpu', 'cpuset'):
+            try:
+                with open(os.path.join(parent, 'cgroup.subtree_control'), 'w') as f:
+                    f.write(f"+{controller}")
+            except OSError:
+                pass  # already on, or owned by systemd; the writes below tell
+    if settings.get('cpus') is not None:
+        cpus = parse_cpus(settings['cpus'])
+        if cpus:
+            with open(os.path.join(path, 'cpuset.cpus'), 'w') as f:
+                f.write(format_cpus(cpus))
+    if settings.get('cpu_weight') is not None:
+        with open(os.path.join(path, 'cpu.weight'), 'w') as f:
+            f.write(str(settings['cpu_weight']))
+    return path
+
+def _place(settings, tid, cgroup, errors):
+    """Affinity, nice and cgroup for one thread/process (0: the caller)"""
+    if settings.get('cpus') is not None:
+        cpus = parse_cpus(settings['cpus'])
+        if cpus:
+            try:
+                os.sched_setaffinity(tid, cpus)
+            except OSError as e:
+                errors.append(f"cpus {settings['cpus']}: {e.strerror}")
+        else:
+            errors.append(f"cpus {settings['cpus']}: none of them online, left as is")
+    if settings.get('nice') is not None:
+        try:
+            os.setpriority(os.PRIO_PROCESS, tid, int(settings['nice']))
+        except OSError as e:
+            errors.append(f"nice {settings['nice']}: {e.strerror}")
+    if cgroup:
+        try:
+            with open(os.path.join(cgroup, 'cgroup.procs'), 'w') as f:
+                f.write(str(tid or os.getpid()))
+        except OSError as e:
+            errors.append(f"cgroup {cgroup}: {e.strerror}")
+
+def preexec(policy, role, then=None):
+    """preexec_fn for subprocess.Popen placing the child before it execs;
+    then (e.g. os.setsid) runs first. Failures are silent here, describe()
+    on the child shows what took."""
+    settings = _role(policy, role)
+    try:
+        cgroup = prepare_cgroup(policy, role)
+    except OSError:
+        cgroup = None
+
+    def place():
+        if then:
+            then()
+        _place(settings, 0, cgroup, [])
+    return place
+
+def command(policy, role, cmd):
+    """cmd, prefixed with ionice(1) if the role asks for an I/O class"""
+    spec = _role(policy, role).get('ionice')
+    if not spec or not shutil.which('ionice'):
+        return cmd
+    try:
+        return ['ionice'] + _ionice_args(spec) + list(cmd)
+    except KeyError:
+        return cmd
+
+def describe(pid):
+    """Placement the kernel reports for a process or thread"""
+    found = {'pid': pid}
+    try:
+        found['cpus'] = format_cpus(os.sched_getaffinity(pid))
+        found['nice'] = os.getpriority(os.PRIO_PROCESS, pid)
+    except OSError:
+        return found
+    if shutil.which('ionice'):
+        result = subprocess.run(['ionice', '-p', str(pid)], capture_output=True, text=True)
+        if result.returncode == 0:
+            found['ionice'] = result.stdout.strip()
+    try:
+        with open(f"/proc/{pid}/cgroup") as f:
+            for line in f:
+                if line.startswith('0::'):
+                    found['cgroup'] = line[3:].strip()
+    except OSError:
+        pass
+    return found
+
+def apply(policy, role, tid=None):
+    """Place the calling process (or thread tid, e.g. threading.get_native_id())
+    and return {role, requested, applied, errors} for run.json. On Linux
+    affinity and nice are per thread, so call it before starting threads
+    that should inherit it."""
+    settings = _role(policy, role)
+    errors = []
+    pid = tid or os.getpid()
+    cgroup = None
+    if tid is None:
+        try:
+            cgroup = prepare_cgroup(policy, role)
+        except OSError as e:
+            errors.append(f"cgroup: {e.strerror or e}")
+    _place(settings, tid or 0, cgroup, errors)
+    spec = settings.get('ionice')
+    if spec and shutil.which('ionice'):
+        try:
+            subprocess.run(['ionice'] + _ionice_args(spec) + ['-p', str(pid)],
+                           check=True, capture_output=True, text=True)
+        except (KeyError, subprocess.CalledProcessError) as e:
+            errors.append(f"ionice {spec}: {getattr(e, 'stderr', '') or e}".strip())
+    return {'role': role, 'requested': settings, 'applied': describe(pid), 'errors': errors}
+
+def spawned(policy, role, proc, cmd):
+    """run.json record for a child started with preexec()/command()"""
+    settings = _role(policy, role)
+    errors = []
+    if settings.get('cpus') is not None and not parse_cpus(settings['cpus']):
+        errors.append(f"cpus {settings['cpus']}: none of them online, left as is")
+    return {'role': role, 'cmd': ' '.join(cmd), 'requested': settings,
+            'applied': describe(proc.pid), 'errors': errors}
+
+def summary(record):
+    """One line for the console: 'measure: CPUs 0-1, nice 0 (nice -5: Permission denied)'"""
+    applied = record.get('applied', {})
+    line = f"{record['role']}: CPUs {applied.get('cpus', '?')}, nice {applied.get('nice', '?')}"
+    if applied.get('ionice'):
+        line += f", io {applied['ionice']}"
+    if applied.get('cgroup'):
+        line += f", cgroup {applied['cgroup']}"
+    if record.get('errors'):
+        line += f" ({'; '.join(record['errors'])})"
+    return line
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the CPU placement policy and where processes run')
+    parser.add_argument('--policy', default=POLICY_PATH)
+    parser.add_argument('--pid', type=int, help='Show where this process/thread actually runs')
+    args = parser.parse_args()
+
+    if args.pid:
+        print(json.dumps(describe(args.pid), indent=2))
+        return
+    policy = load_policy(args.policy)
+    if not policy:
+        print(f"No placement policy at {args.policy}")
+        return
+    online = online_cpus()
+    print(f"{args.policy}: {len(online)} CPUs online ({format_cpus(online)})")
+    if policy.get('cgroup_root'):
+        print(f"cgroup v2 groups under {policy['cgroup_root']}")
+    for role, settings in policy['roles'].items():
+        cpus = parse_cpus(settings['cpus'], online) if settings.get('cpus') is not None else online
+        print(f"  {role:<8} CPUs {format_cpus(cpus) or 'none online -> unchanged'}"
+              f"  nice {settings.get('nice', '-')}  io {settings.get('ionice', '-')}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+#
+# BURN TEST ROLLUPS
+# Incremental min/mean/max buckets per channel, kept by burn_test.py next
+# to the full-resolution burn_test.csv:
+#   burn_test_rollup_1m.csv        one row per minute
+#   burn_test_rollup_10m.csv       one row per 10 min   (long-run overview)
+#   burn_test_rollup_1m_means.csv  the 1m means only    (streamed while running)
+# Each row is written once, when its bucket closes (or the stage changes).
+# The mean of each channel goes under the original burn_test.csv column
+# name, so anything that plots burn_test.csv plots a rollup unchanged;
+# '<channel> min' / '<channel> max' and 'samples' follow at the end. The
+# min/max columns make a row about three times wider than a raw sample, so
+# the streamed file leaves them out; they go up with the final upload.
+#
+
+import csv
+import os
+import time
+from datetime import datetime
+
+# label -> bucket width in seconds
+RESOLUTIONS = {'1m': 60, '10m': 600}
+
+# What main.py streams as gpuTestGraph while the burn test is running
+STREAM_RESOLUTION = '1m'
+
+def rollup_path(log_dir, label):
+    return os.path.join(log_dir, f"burn_test_rollup_{label}.csv")
+
+def stream_path(log_dir):
+    return os.path.join(log_dir, f"burn_test_rollup_{STREAM_RESOLUTION}_means.csv")
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class Rollup:
+    """min/mean/max buckets of one width, appended to a CSV as they close"""
+
+    def __init__(self, path, seconds, channels, means_path=None):
+        self.path = path
+        self.seconds = seconds
+        self.channels = channels
+        self.fieldnames = (['time', 'stage'] + channels + ['samples'] +
+                           [f"{c} {kind}" for c in channels for kind in ('min', 'max')])
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames)
+        self.writer.writeheader()
+        self.file.flush()
+        # Optional second file with just time, stage and the means
+        self.means_file = None
+        if means_path:
+            self.means_file = open(means_path, 'w', newline='')
+            self.means_writer = csv.DictWriter(self.means_file, fieldnames=['time', 'stage'] + channels,
+                                               extrasaction='ignore')
+            self.means_writer.writeheader()
+            self.means_file.flush()
+        self.key = None
+        self._reset()
+
+    def _reset(self):
+        self.count = 0
+        self.sums = dict.fromkeys(self.channels, 0.0)
+        self.counts = dict.fromkeys(self.channels, 0)
+        self.mins = dict.fromkeys(self.channels)
+        self.maxs = dict.fromkeys(self.channels)
+
+    def add(self, stats, stage, now=None):
+        """Fold one sample in, closing the current bucket if it's over"""
+        now = time.time() if now is None else now
+        key = (int(now // self.seconds), stage)
+        if key != self.key:
+            self.flush_bucket()
+            self.key = key
+        self.count += 1
+        for channel in self.channels:
+            value = _number(stats.get(channel))
+            if value is None:
+                continue
+            self.sums[channel] += value
+            self.counts[channel] += 1
+            if self.mins[channel] is None or value < self.mins[channel]:
+                self.mins[channel] = value
+            if self.maxs[channel] is None or value > self.maxs[channel]:
+                self.maxs[channel] = value
+
+    def flush_bucket(self):
+        if self.key is None or not self.count:
+            return
+        bucket, stage = self.key
+        row = {
+            'time': datetime.fromtimestamp(bucket * self.seconds).strftime("%Y-%m-%d %H:%M:%S"),
+            'stage': stage,
+            'samples': self.count,
+        }
+        for channel in self.channels:
+            n = self.counts[channel]
+            # Means to 3 decimals, finer than the sensors resolve anyway
+            row[channel] = round(self.sums[channel] / n, 3) if n else None
+            row[f"{channel} min"] = self.mins[channel]
+            row[f"{channel} max"] = self.maxs[channel]
+        self.writer.writerow(row)
+        self.file.flush()
+        if self.means_file:
+            self.means_writer.writerow(row)
+            self.means_file.flush()
+        self._reset()
+
+    def close(self):
+        """Write the partial last bucket and close the file"""
+        self.flush_bucket()
+        self.key = None
+        self.file.close()
+        if self.means_file:
+            self.means_file.close()
+
+def open_rollups(log_dir, channels):
+    return [Rollup(rollup_path(log_dir, label), seconds, channels,
+                   stream_path(log_dir) if label == STREAM_RESOLUTION else None)
+            for label, seconds in RESOLUTIONS.items()]
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+#
+# PER-RUN LOG DIRECTORIES
+# Every main.py invocation gets its own directory so a re-run never
+# overwrites the previous evidence:
+#   qa_logs/runs/<run id>/run.json              run metadata
+#   qa_logs/runs/<run id>/stage4_gpu/burn_test.csv
+#   qa_logs/runs/<run id>/stage5_final/stage5_nvme_test.txt ...
+#   qa_logs/current -> runs/<run id>           swapped atomically (rename)
+#   qa_logs/runs/<older run id>.tar.gz          finished runs, compressed
+# Finished runs are compressed in a background thread when a new run
+# starts, then the oldest archives are pruned to QA_LOG_KEEP_RUNS runs and
+# QA_LOG_MAX_MB in total. The current run is never touched.
+#
+#   python3 runlogs.py list
+#   python3 runlogs.py prune --keep 5 --max-mb 200
+#
+
+import argparse
+import json
+import os
+import shutil
+import tarfile
+import threading
+from datetime import datetime
+
+KEEP_RUNS = int(os.environ.get("QA_LOG_KEEP_RUNS", "10"))
+MAX_BYTES = int(float(os.environ.get("QA_LOG_MAX_MB", "512")) * 1024 * 1024)
+
+ARCHIVE_SUFFIX = '.tar.gz'
+
+def runs_dir(root):
+    return os.path.join(root, 'runs')
+
+def current_link(root):
+    return os.path.join(root, 'current')
+
+def current_run_id(root):
+    """Run id the 'current' pointer names, or None"""
+    try:
+        return os.path.basename(os.readlink(current_link(root)))
+    except OSError:
+        return None
+
+def point_current(root, run_id):
+    """Swap root/current to runs/<run_id> in one rename, so a reader sees
+    either the old run or the new one and never a missing link"""
+    tmp = os.path.join(root, f'.current.{os.getpid()}')
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    os.symlink(os.path.join('runs', run_id), tmp)
+    os.replace(tmp, current_link(root))
+
+class RunLog:
+    """One QA run's directory; stage directories are made on first use"""
+
+    def __init__(self, root, run_id):
+        self.root = root
+        self.run_id = run_id
+        self.dir = os.path.join(runs_dir(root), run_id)
+        self.lock = threading.Lock()
+
+    def stage_dir(self, number, name):
+        path = self.dir if number is None else os.path.join(self.dir, f"stage{number}_{name}")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def write_meta(self, **fields):
+        """Merge fields into run.json (written via rename, never half-written)"""
+        path = os.path.join(self.dir, 'run.json')
+        with self.lock:
+            try:
+                with open(path) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = {}
+            meta.update(fields)
+            with open(path + '.tmp', 'w') as f:
+                json.dump(meta, f, indent=2, default=str)
+            os.replace(path + '.tmp', path)
+
+def start_run(root, hostname=None, on_start=None):
+    """Create a new run directory, point 'current' at it and start
+    compressing and pruning the older runs in the background. on_start runs
+    first inside that thread (main.py uses it to lower the thread's priority)."""
+    os.makedirs(runs_dir(root), exist_ok=True)
+    base = datetime.now().strftime("%Y%m%d-%H%M%S")
+    run_id, n = base, 1
+    while os.path.exists(os.path.join(runs_dir(root), run_id)) or \
+            os.path.exists(os.path.join(runs_dir(root), run_id + ARCHIVE_SUFFIX)):
+        n += 1
+        run_id = f"{base}-{n}"
+    run = RunLog(root, run_id)
+    os.makedirs(run.dir)
+    run.write_meta(run_id=run_id, hostname=hostname, started=datetime.now().isoformat(timespec='seconds'))
+    point_current(root, run_id)
+
+    def work():
+        if on_start:
+            try:
+                on_start()
+            except Exception as e:
+                print(f"⚠️ Log maintenance setup failed: {e}")
+        maintain(root)
+
+    thread = threading.Thread(target=work, name='runlogs', daemon=True)
+    thread.start()
+    return run
+
+def compress_run(root, run_id):
+    """runs/<id>/ -> runs/<id>.tar.gz; the directory goes only once the archive is complete"""
+    src = os.path.join(runs_dir(root), run_id)
+    archive = src + ARCHIVE_SUFFIX
+    with tarfile.open(archive + '.tmp', 'w:gz') as tar:
+        tar.add(src, arcname=run_id)
+    os.replace(archive + '.tmp', archive)
+    shutil.rmtree(src)
+    return archive
+
+def list_runs(root):
+    """[(run_id, path, bytes, compressed)] oldest first"""
+    runs = []
+    base = runs_dir(root)
+    if not os.path.isdir(base):
+        return runs
+    for name in sorted(os.listdir(base)):
+        path = os.path.join(base, name)
+        if name.endswith(ARCHIVE_SUFFIX):
+            runs.append((name[:-len(ARCHIVE_SUFFIX)], path, os.path.getsize(path), True))
+        elif os.path.isdir(path):
+            size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+            runs.append((name, path, size, False))
+    return runs
+
+def prune(root, keep_runs=KEEP_RUNS, max_bytes=MAX_BYTES):
+    """Delete the oldest finished runs until both caps hold; returns what went"""
+    current = current_run_id(root)
+    runs = list_runs(root)
+    total = sum(size for _, _, size, _ in runs)
+    count = len(runs)
+    removed = []
+    for run_id, path, size, compressed in runs:
+        if count <= keep_runs and total <= max_bytes:
+            break
+        if run_id == current:
+            continue
+        if compressed:
+            os.remove(path)
+        else:
+            shutil.rmtree(path)
+        removed.append(run_id)
+        count -= 1
+        total -= size
+    return removed
+
+def maintain(root, keep_runs=KEEP_RUNS, max_bytes=MAX_BYTES):
+    """Compress every finished run, then prune. Never raises: log housekeeping
+    must not take the QA run down with it."""
+    current = current_run_id(root)
+    try:
+        for run_id, _, _, compressed in list_runs(root):
+            if not compressed and run_id != current:
+                compress_run(root, run_id)
+                print(f"🗜️ Compressed logs of run {run_id}")
+        removed = prune(root, keep_runs, max_bytes)
+        if removed:
+            print(f"🧹 Pruned old runs: {', '.join(removed)}")
+    except Exception as e:
+        print(f"⚠️ Log maintenance failed: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and prune per-run QA logs')
+    parser.add_argument('--root', default=os.environ.get("QA_LOG_DIR", "/home/truffle/qa_logs"))
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='List runs, newest last')
+    prune_cmd = sub.add_parser('prune', help='Compress finished runs and apply retention')
+    prune_cmd.add_argument('--keep', type=int, default=KEEP_RUNS, help=f'Runs to keep (default: {KEEP_RUNS})')
+    prune_cmd.add_argument('--max-mb', type=float, default=MAX_BYTES / 1024 / 1024,
+                           help=f'Total size cap in MB (default: {MAX_BYTES // 1024 // 1024})')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        current = current_run_id(args.root)
+        for run_id, path, size, compressed in list_runs(args.root):
+            marker = ' <- current' if run_id == current else ''
+            kind = 'tar.gz' if compressed else 'dir'
+            print(f"{run_id:<20} {kind:<7} {size / 1024 / 1024:>8.2f} MB{marker}")
+    else:
+        maintain(args.root, args.keep, int(args.max_mb * 1024 * 1024))
+
+if __name__ == "__main__":
+    main()
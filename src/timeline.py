@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+#
+# MERGED TEST TIMELINE
+# Streams every log line and burn_test.csv sample of a stage directory
+# onto one timeline (k-way merge, one line in memory per source):
+#   timeline.tsv   <epoch>\t<source>\t<kind>\t<text>, sorted by time
+#   timeline.idx   (second, byte offset) every INDEX_STEP seconds, packed
+#                  int64 pairs, so a range query bisects the index and
+#                  seeks instead of reading whole files
+#
+#   python3 timeline.py build qa_logs/current/stage5_final
+#   python3 timeline.py query qa_logs/current/stage5_final --at "2025-05-13 03:21:52" --window 30
+#   python3 timeline.py query qa_logs/current/stage5_final --from "..." --to "..." --source stage5_hotspot_test
+#
+# Understood timestamps: "[%Y-%m-%d %H:%M:%S] msg" (our scripts), the
+# "=== ... Started/Completed at <datetime> ===" markers run_script_with_logging
+# writes, plain `date` output, and the CSV time column. Lines without one
+# (tool output) take the previous line's time. Each source is clamped to
+# never go backwards so the merged timeline stays monotonic.
+#
+
+import argparse
+import csv
+import glob
+import heapq
+import os
+import re
+import struct
+import sys
+from datetime import datetime
+
+TIMELINE_NAME = 'timeline.tsv'
+INDEX_NAME = 'timeline.idx'
+INDEX_STEP = 10  # seconds between index entries
+INDEX_RECORD = struct.Struct('<qq')
+
+# burn_test.csv channels worth a line on the timeline
+SAMPLE_CHANNELS = ['stage', 'Temp tj', 'Power TOT', 'GPU', 'Fan pwmfan0']
+
+ANSI = re.compile(r'\x1b\[[0-9;]*m')
+STAMP = r'(?P<stamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})(?:\.\d+)?'
+# (pattern, strptime format, kind); 'text' is what goes on the timeline,
+# the whole line when the pattern has no text group
+PATTERNS = [
+    (re.compile(rf'^\[{STAMP}\]\s?(?P<text>.*)$'), '%Y-%m-%d %H:%M:%S', 'log'),
+    (re.compile(rf'^=== .*Started at {STAMP} ===$'), '%Y-%m-%d %H:%M:%S', 'start'),
+    (re.compile(rf'^=== Completed at {STAMP} .*===$'), '%Y-%m-%d %H:%M:%S', 'end'),
+    # `date` default, e.g. "Tue May 13 03:21:52 UTC 2025"
+    (re.compile(r'^(?P<stamp>\w{3} \w{3} +\d{1,2} \d{2}:\d{2}:\d{2}) \w+ (?P<year>\d{4})\b\s?(?P<text>.*)$'),
+     '%a %b %d %H:%M:%S %Y', 'log'),
+]
+
+def parse_line(line):
+    """(epoch or None, kind, text) for one log line"""
+    line = ANSI.sub('', line).rstrip('\r\n')
+    for pattern, fmt, kind in PATTERNS:
+        match = pattern.match(line)
+        if not match:
+            continue
+        fields = match.groupdict()
+        stamp = ' '.join(fields['stamp'].split() + ([fields['year']] if fields.get('year') else []))
+        try:
+            ts = datetime.strptime(stamp, fmt).timestamp()
+        except ValueError:
+            break
+        return ts, kind, fields.get('text') or line.strip('= ')
+    return None, 'log', line
+
+def log_events(path, source):
+    """Yield (ts, source, kind, text) for a text log, in file order"""
+    last = None
+    pending = []  # lines before the first timestamp
+    with open(path, errors='replace') as f:
+        for line in f:
+            ts, kind, text = parse_line(line)
+            if not text.strip():
+                continue
+            if ts is None:
+                if last is None:
+                    pending.append(text)
+                    continue
+                ts = last
+            ts = ts if last is None else max(ts, last)
+            for early in pending:
+                yield ts, source, 'log', early
+            pending = []
+            last = ts
+            yield ts, source, kind, text
+
+def sample_events(path, source):
+    """Yield (ts, source, 'sample', 'Temp tj=.. Power TOT=..') for a burn_test.csv"""
+    last = None
+    with open(path, newline='', errors='replace') as f:
+        for row in csv.DictReader(f):
+            try:
+                ts = datetime.strptime(row.get('time') or '', '%Y-%m-%d %H:%M:%S').timestamp()
+            except ValueError:
+                continue
+            ts = ts if last is None else max(ts, last)
+            last = ts
+            fields = [f"{name}={row[name]}" for name in SAMPLE_CHANNELS if row.get(name) not in (None, '')]
+            yield ts, source, 'sample', ' '.join(fields) or 'shutdown'
+
+def sources(stage_dir):
+    """Every text log and burn_test.csv in a stage directory"""
+    streams = []
+    for path in sorted(glob.glob(os.path.join(stage_dir, '*.txt'))):
+        streams.append(log_events(path, os.path.splitext(os.path.basename(path))[0]))
+    csv_path = os.path.join(stage_dir, 'burn_test.csv')
+    if os.path.exists(csv_path):
+        streams.append(sample_events(csv_path, 'burn_test'))
+    return streams
+
+def build(stage_dir, out_dir=None):
+    """Merge a stage directory into timeline.tsv + timeline.idx; returns (path, events)"""
+    out_dir = out_dir or stage_dir
+    out_path = os.path.join(out_dir, TIMELINE_NAME)
+    idx_path = os.path.join(out_dir, INDEX_NAME)
+    count = 0
+    next_index = None
+    # Stable across sources with equal timestamps: heapq.merge keeps input order
+    merged = heapq.merge(*sources(stage_dir), key=lambda event: event[0])
+    with open(out_path + '.tmp', 'wb') as out, open(idx_path + '.tmp', 'wb') as idx:
+        for ts, source, kind, text in merged:
+            second = int(ts)
+            if next_index is None or second >= next_index:
+                idx.write(INDEX_RECORD.pack(second, out.tell()))
+                next_index = second - second % INDEX_STEP + INDEX_STEP
+            text = text.replace('\t', ' ')
+            out.write(f"{ts:.3f}\t{source}\t{kind}\t{text}\n".encode())
+            count += 1
+    os.replace(out_path + '.tmp', out_path)
+    os.replace(idx_path + '.tmp', idx_path)
+    return out_path, count
+
+def _index_offset(idx_path, start):
+    """Byte offset of the last index entry at or before start (bisect on disk)"""
+    size = os.path.getsize(idx_path)
+    lo, hi = 0, size // INDEX_RECORD.size
+    offset = 0
+    with open(idx_path, 'rb') as idx:
+        while lo < hi:
+            mid = (lo + hi) // 2
+            idx.seek(mid * INDEX_RECORD.size)
+            second, position = INDEX_RECORD.unpack(idx.read(INDEX_RECORD.size))
+            if second <= start:
+                offset = position
+                lo = mid + 1
+            else:
+                hi = mid
+    return offset
+
+def query(timeline_dir, start, end, source=None):
+    """Yield (ts, source, kind, text) with start <= ts <= end"""
+    path = os.path.join(timeline_dir, TIMELINE_NAME)
+    with open(path, 'rb') as f:
+        f.seek(_index_offset(os.path.join(timeline_dir, INDEX_NAME), start))
+        for raw in f:
+            ts, name, kind, text = raw.decode(errors='replace').rstrip('\n').split('\t', 3)
+            ts = float(ts)
+            if ts > end:
+                break
+            if ts < start or (source and name != source):
+                continue
+            yield ts, name, kind, text
+
+def _when(value):
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').timestamp()
+
+def main():
+    parser = argparse.ArgumentParser(description='Merged, indexed timeline of a stage log directory')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build_cmd = sub.add_parser('build', help='Merge logs and burn_test.csv into timeline.tsv/.idx')
+    build_cmd.add_argument('stage_dir')
+    query_cmd = sub.add_parser('query', help='Events in a time range')
+    query_cmd.add_argument('stage_dir')
+    query_cmd.add_argument('--at', help='Centre of the window, "YYYY-mm-dd HH:MM:SS"')
+    query_cmd.add_argument('--window', type=float, default=30, help='Seconds either side of --at (default: 30)')
+    query_cmd.add_argument('--from', dest='start', help='Range start, "YYYY-mm-dd HH:MM:SS"')
+    query_cmd.add_argument('--to', dest='end', help='Range end, "YYYY-mm-dd HH:MM:SS"')
+    query_cmd.add_argument('--source', help='Only this source, e.g. stage5_hotspot_test or burn_test')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        path, count = build(args.stage_dir)
+        print(f"Merged {count} events into {path}")
+        return 0
+
+    if not os.path.exists(os.path.join(args.stage_dir, TIMELINE_NAME)):
+        build(args.stage_dir)
+    if args.at:
+        start, end = _when(args.at) - args.window, _when(args.at) + args.window
+    elif args.start or args.end:
+        start = _when(args.start) if args.start else 0
+        end = _when(args.end) if args.end else float('inf')
+    else:
+        parser.error('give --at or --from/--to')
+    width = max((len(os.path.splitext(os.path.basename(p))[0])
+                 for p in glob.glob(os.path.join(args.stage_dir, '*.txt'))), default=10)
+    for ts, name, kind, text in query(args.stage_dir, start, end, args.source):
+        stamp = datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"{stamp}  {name:<{width}}  {text}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+#
+# SPAN TRACING
+# Lightweight timers for the orchestrator. Off unless QA_TRACE is set:
+#   QA_TRACE=1                      -> <LOG_DIR>/current/trace.jsonl
+#   QA_TRACE=/tmp/run1.jsonl        -> that file
+# When off, span() hands back a shared no-op and @traced costs one
+# global lookup per call.
+#
+# Each finished span is one JSON line. Afterwards:
+#   python3 tracing.py summary trace.jsonl
+#   python3 tracing.py chrome trace.jsonl -o trace.json   (chrome://tracing, ui.perfetto.dev)
+#
+
+import argparse
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+_sink = None
+_lock = threading.Lock()
+_local = threading.local()
+
+def enable(path):
+    """Start appending spans to path and print a summary when we exit"""
+    global _sink
+    if _sink is not None:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    _sink = open(path, 'a', buffering=1)
+    print(f"⏱️ Tracing spans to {path}")
+    atexit.register(_finish, path)
+
+def enable_from_env(default_path):
+    value = os.environ.get("QA_TRACE")
+    if value:
+        enable(default_path if value.lower() in ('1', 'true', 'yes') else value)
+
+def enabled():
+    return _sink is not None
+
+def _finish(path):
+    global _sink
+    if _sink is None:
+        return
+    with _lock:
+        _sink.close()
+        _sink = None
+    print_summary(load(path))
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP = _NoopSpan()
+
+class _Span:
+    __slots__ = ('name', 'args', 'ts', 'start', 'depth')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = getattr(_local, 'depth', 0)
+        self.depth = stack
+        _local.depth = stack + 1
+        self.ts = time.time()
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        dur = time.monotonic() - self.start
+        _local.depth = self.depth
+        record = {
+            'name': self.name,
+            'ts': self.ts,
+            'dur': dur,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'thread': threading.current_thread().name,
+            'depth': self.depth,
+            'ok': exc_type is None,
+        }
+        if self.args:
+            record['args'] = self.args
+        line = json.dumps(record, default=str)
+        with _lock:
+            if _sink is not None:
+                _sink.write(line + '\n')
+        return False
+
+def span(name, **args):
+    """Context manager timing a block; no-op unless tracing is enabled"""
+    if _sink is None:
+        return _NOOP
+    return _Span(name, args)
+
+def traced(func):
+    """Decorator timing every call of func, tagged with its positional args"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _sink is None:
+            return func(*args, **kwargs)
+        tags = {f'arg{i}': str(a)[:80] for i, a in enumerate(args)}
+        tags.update({k: str(v)[:80] for k, v in kwargs.items()})
+        with _Span(func.__name__, tags):
+            return func(*args, **kwargs)
+    return wrapper
+
+def load(path):
+    records = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    pass  # partial last line from a killed run
+    return records
+
+def summarize(records):
+    """Per span name totals, plus how much of the run the top-level spans cover"""
+    if not records:
+        return {'wall': 0.0, 'names': {}, 'top_level': 0.0}
+    start = min(r['ts'] for r in records)
+    end = max(r['ts'] + r['dur'] for r in records)
+    names = {}
+    for r in records:
+        entry = names.setdefault(r['name'], {'count': 0, 'total': 0.0, 'max': 0.0, 'failed': 0})
+        entry['count'] += 1
+        entry['total'] += r['dur']
+        entry['max'] = max(entry['max'], r['dur'])
+        entry['failed'] += 0 if r.get('ok', True) else 1
+    top_level = sum(r['dur'] for r in records if r['depth'] == 0 and r['thread'] == 'MainThread')
+    return {'wall': end - start, 'names': names, 'top_level': top_level}
+
+def print_summary(records):
+    summary = summarize(records)
+    wall = summary['wall']
+    if not wall:
+        print("⏱️ No spans recorded")
+        return
+    print(f"\n⏱️ Where the time went ({wall:.1f}s wall clock)")
+    print(f"{'span':<34} {'count':>6} {'total s':>10} {'mean s':>9} {'max s':>9} {'% wall':>7}")
+    ordered = sorted(summary['names'].items(), key=lambda item: item[1]['total'], reverse=True)
+    for name, entry in ordered:
+        failed = f"  ({entry['failed']} failed)" if entry['failed'] else ""
+        print(f"{name[:34]:<34} {entry['count']:>6} {entry['total']:>10.2f} "
+              f"{entry['total'] / entry['count']:>9.3f} {entry['max']:>9.3f} "
+              f"{entry['total'] / wall:>6.1%}{failed}")
+    untraced = wall - summary['top_level']
+    print(f"{'(main thread outside spans)':<34} {'':>6} {untraced:>10.2f} {'':>9} {'':>9} {untraced / wall:>6.1%}")
+    print("Background threads overlap, so the % column can add up to more than 100%")
+
+def to_chrome(records):
+    """Chrome trace-event format: one complete ('X') event per span"""
+    t0 = min((r['ts'] for r in records), default=0)
+    events = []
+    threads = {}
+    for r in records:
+        threads[(r['pid'], r['tid'])] = r['thread']
+        events.append({
+            'name': r['name'],
+            'ph': 'X',
+            'ts': (r['ts'] - t0) * 1e6,
+            'dur': r['dur'] * 1e6,
+            'pid': r['pid'],
+            'tid': r['tid'],
+            'args': dict(r.get('args', {}), ok=r.get('ok', True)),
+        })
+    for (pid, tid), name in threads.items():
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect QA span traces')
+    sub = parser.add_subparsers(dest='command', required=True)
+    summary = sub.add_parser('summary', help='Print where the wall-clock time went')
+    summary.add_argument('trace')
+    chrome = sub.add_parser('chrome', help='Export to Chrome trace-event JSON')
+    chrome.add_argument('trace')
+    chrome.add_argument('-o', '--output', help='Output file (default: <trace>.chrome.json)')
+    args = parser.parse_args()
+
+    records = load(args.trace)
+    if args.command == 'summary':
+        print_summary(records)
+    else:
+        out = args.output or os.path.splitext(args.trace)[0] + '.chrome.json'
+        with open(out, 'w') as f:
+            json.dump(to_chrome(records), f)
+        print(f"Wrote {len(records)} spans to {out}")
+
+if __name__ == "__main__":
+    sys.exit(main())
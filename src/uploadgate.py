@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+#
+# UPLOAD GATE
+# Every backend upload goes through one gate so uploads don't perturb the
+# tests they report on:
+#   - one upload on the wire at a time, under a token-bucket byte rate
+#     (QA_UPLOAD_KBPS, 0 = unlimited)
+#   - waiting uploads go in priority order:
+#       PRIORITY_STAGE  stage transitions
+#       PRIORITY_FINAL  final log uploads
+#       PRIORITY_LIVE   periodic live tails
+#   - while a network-sensitive phase is active (the hotspot test) live
+#     tails trickle through a much slower bucket (QA_UPLOAD_SENSITIVE_KBPS,
+#     0 = hold them back entirely); stage updates and final logs still go
+#   - time spent waiting is recorded per stream (metrics.py exposes it,
+#     main.py keeps the totals in run.json)
+# Files are read only after the gate is granted, so a deferred live tail
+# sends the newest content and doesn't compete with the NVMe test for disk.
+#
+
+import heapq
+import itertools
+import threading
+import time
+
+import metrics
+
+PRIORITY_STAGE = 0
+PRIORITY_FINAL = 1
+PRIORITY_LIVE = 2
+
+# How often a waiter re-checks its cancel event
+CANCEL_POLL = 1.0
+
+class TokenBucket:
+    """Byte-rate limiter; a transfer larger than the burst runs into debt
+    and the caller waits it off before the next one"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, nbytes):
+        """Take nbytes and return how long to wait before sending"""
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= nbytes
+        return max(0.0, -self.tokens / self.rate)
+
+class UploadGate:
+    def __init__(self, rate=0, burst=None, sensitive_rate=0):
+        self.bucket = TokenBucket(rate, burst if burst is not None else max(64 * 1024, rate))
+        self.sensitive_rate = sensitive_rate
+        self.sensitive = TokenBucket(sensitive_rate, max(16 * 1024, sensitive_rate))
+        self.cond = threading.Condition()
+        self.waiting = []
+        self.order = itertools.count()
+        self.busy = False
+        self.pauses = set()
+        self.deferred = {}
+
+    def _publish(self):
+        metrics.set_upload_queue(len(self.waiting), len(self.pauses))
+
+    def pause(self, reason):
+        """Hold back live tails until resume(reason)"""
+        with self.cond:
+            self.pauses.add(reason)
+            self._publish()
+            self.cond.notify_all()
+
+    def resume(self, reason):
+        with self.cond:
+            self.pauses.discard(reason)
+            self._publish()
+            self.cond.notify_all()
+
+    def _wait_for(self, entry):
+        """0 if entry may go now, else how long to wait (None: until notified)"""
+        priority, _, nbytes, not_before = entry
+        if self.busy or self.waiting[0] is not entry:
+            return None
+        if priority < PRIORITY_LIVE or not self.pauses:
+            return 0
+        if not self.sensitive_rate:
+            return None
+        # Live tail during a sensitive phase: book it on the slow bucket once
+        if not_before is None:
+            entry[3] = not_before = time.monotonic() + self.sensitive.reserve(nbytes)
+        return max(0, not_before - time.monotonic())
+
+    def acquire(self, priority, stream, nbytes=0, cancel=None):
+        """Block until it's this upload's turn. Returns the seconds deferred,
+        or None if cancel (a threading.Event) was set while waiting."""
+        requested = time.monotonic()
+        entry = [priority, next(self.order), nbytes, None]
+        with self.cond:
+            heapq.heappush(self.waiting, entry)
+            self._publish()
+            try:
+                while True:
+                    wait = self._wait_for(entry)
+                    if wait == 0:
+                        break
+                    if cancel is not None and cancel.is_set():
+                        return None
+                    if cancel is not None:
+                        wait = CANCEL_POLL if wait is None else min(wait, CANCEL_POLL)
+                    self.cond.wait(wait)
+            finally:
+                self.waiting.remove(entry)
+                heapq.heapify(self.waiting)
+                self._publish()
+                self.cond.notify_all()
+            self.busy = True
+            delay = 0.0 if entry[3] is not None else self.bucket.reserve(nbytes)
+        if delay:
+            time.sleep(delay)  # holding the slot: the link is what's being rationed
+        deferred = time.monotonic() - requested
+        with self.cond:
+            self.deferred[stream] = self.deferred.get(stream, 0.0) + deferred
+        metrics.upload_deferred(stream, deferred)
+        return deferred
+
+    def deferred_totals(self):
+        """Seconds each stream has spent waiting for the gate so far"""
+        with self.cond:
+            return dict(self.deferred)
+
+    def release(self):
+        with self.cond:
+            self.busy = False
+            self.cond.notify_all()
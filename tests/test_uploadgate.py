@@ -0,0 +1,103 @@
+#
+# Offline checks for src/uploadgate.py: ordering, cancellation and the
+# sensitive-phase slowdown, with no backend or network involved.
+#   python3 -m pytest tests
+#
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import uploadgate
+from uploadgate import PRIORITY_FINAL, PRIORITY_LIVE, PRIORITY_STAGE, UploadGate
+
+def wait_until(check, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def start_waiter(gate, priority, stream, nbytes=0, cancel=None, granted=None):
+    """Acquire in a thread; granted collects the streams in the order they got the gate"""
+    result = {}
+
+    def run():
+        result['deferred'] = gate.acquire(priority, stream, nbytes, cancel)
+        if result['deferred'] is not None:
+            if granted is not None:
+                granted.append(stream)
+            gate.release()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, result
+
+def test_waiters_go_in_priority_order():
+    gate = UploadGate()
+    gate.acquire(PRIORITY_LIVE, 'holder')
+    granted = []
+    threads = []
+    # Queued worst first; FIFO within a priority
+    for priority, stream in [(PRIORITY_LIVE, 'live1'), (PRIORITY_FINAL, 'final'),
+                             (PRIORITY_LIVE, 'live2'), (PRIORITY_STAGE, 'stage')]:
+        threads.append(start_waiter(gate, priority, stream, granted=granted)[0])
+        wait_until(lambda: len(gate.waiting) == len(threads))
+    gate.release()
+    for thread in threads:
+        thread.join(5)
+    assert granted == ['stage', 'final', 'live1', 'live2']
+
+def test_cancelled_waiter_is_dropped(monkeypatch):
+    monkeypatch.setattr(uploadgate, 'CANCEL_POLL', 0.05)
+    gate = UploadGate()
+    gate.acquire(PRIORITY_LIVE, 'holder')
+    cancel = threading.Event()
+    thread, result = start_waiter(gate, PRIORITY_LIVE, 'live', cancel=cancel)
+    wait_until(lambda: len(gate.waiting) == 1)
+    cancel.set()
+    thread.join(5)
+    assert result['deferred'] is None
+    assert gate.waiting == []
+    gate.release()
+    # Nothing left queued ahead of the next upload
+    assert gate.acquire(PRIORITY_LIVE, 'next') < 0.5
+    gate.release()
+
+def test_pause_slows_only_live_uploads():
+    rate = 10 * 1024
+    gate = UploadGate(sensitive_rate=rate)
+    # Half a second over the slow bucket's burst
+    nbytes = gate.sensitive.burst + rate // 2
+    gate.pause('hotspot')
+
+    assert gate.acquire(PRIORITY_FINAL, 'final', nbytes) < 0.1
+    gate.release()
+    assert gate.acquire(PRIORITY_STAGE, 'stage') < 0.1
+    gate.release()
+    deferred = gate.acquire(PRIORITY_LIVE, 'live', nbytes)
+    gate.release()
+    assert 0.4 < deferred < 2.0
+
+    gate.resume('hotspot')
+    assert gate.acquire(PRIORITY_LIVE, 'live', nbytes) < 0.1
+    gate.release()
+    assert set(gate.deferred_totals()) == {'final', 'stage', 'live'}
+
+def test_pause_without_sensitive_rate_holds_live_until_resume():
+    gate = UploadGate()
+    gate.pause('hotspot')
+    granted = []
+    thread, result = start_waiter(gate, PRIORITY_LIVE, 'live', granted=granted)
+    wait_until(lambda: len(gate.waiting) == 1)
+    # A final upload still overtakes the held tail
+    assert gate.acquire(PRIORITY_FINAL, 'final') < 0.1
+    gate.release()
+    time.sleep(0.2)
+    assert granted == []
+    gate.resume('hotspot')
+    thread.join(5)
+    assert granted == ['live']
+    assert result['deferred'] >= 0.2
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+#
+# FLEET TELEMETRY WAREHOUSE
+# Loads burn logs (burn_test.csv from units, THERMALTEST/*benchmarks) into
+# one SQLite file so cross-unit questions are a query, not a re-parse:
+#   python3 warehouse.py ingest "fleet/*/burn_test.csv" "THERMALTEST/*benchmarks/*.csv"
+#   python3 warehouse.py units
+#   python3 warehouse.py runs --device truffle-0042
+#   python3 warehouse.py fan-curve --device truffle-0042
+#
+# Ingestion is incremental: files already loaded are skipped by sha256, and
+# a file that changed since (a burn_test.csv still growing) replaces its old
+# rows. The device is --device, else the hostname in run.json for a CSV
+# from a per-run log dir (qa_logs/runs/<run id>/stage4_gpu/burn_test.csv,
+# see src/runlogs.py), else the nearest directory name that isn't part of
+# that layout (fleet/truffle-0042/burn_test.csv -> truffle-0042).
+# Samples are indexed by (device, date, ts), and each run's aggregates are
+# computed once at ingest, so the summaries come back in milliseconds.
+#
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from graph import expand_inputs, load_log
+
+DEFAULT_DB = 'qa_warehouse.sqlite'
+
+# CSV channel -> column; missing channels are stored as NULL, like graph.py pads them
+CHANNELS = {
+    'Temp CPU': 'temp_cpu', 'Temp GPU': 'temp_gpu', 'Temp SOC0': 'temp_soc0',
+    'Temp SOC1': 'temp_soc1', 'Temp SOC2': 'temp_soc2', 'Temp Tboard': 'temp_tboard',
+    'Temp Tdiode': 'temp_tdiode', 'Temp tj': 'temp_tj', 'Power TOT': 'power_tot',
+    'RAM': 'ram', 'CPU1': 'cpu1', 'CPU2': 'cpu2', 'CPU3': 'cpu3', 'CPU4': 'cpu4',
+    'CPU5': 'cpu5', 'CPU6': 'cpu6', 'CPU7': 'cpu7', 'CPU8': 'cpu8',
+    'CPU_avg': 'cpu_avg', 'GPU': 'gpu', 'Fan pwmfan0': 'fan',
+}
+
+# Directory names of the per-run log layout, never a device name
+LAYOUT_DIR = re.compile(r'^(stage\d+_\w+|\d{8}-\d{6}(-\d+)?|runs|current|qa_logs)$')
+
+# Power is averaged after the warm-up, once the fan loop has settled
+STEADY_STATE_AFTER_S = 600
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    sha256 TEXT NOT NULL UNIQUE,
+    device TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    ingested_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_path ON files(path);
+
+CREATE TABLE IF NOT EXISTS samples (
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    device TEXT NOT NULL,
+    date TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    stage INTEGER,
+    {', '.join(f'{col} REAL' for col in CHANNELS.values())}
+);
+CREATE INDEX IF NOT EXISTS samples_device_date ON samples(device, date, ts);
+CREATE INDEX IF NOT EXISTS samples_file ON samples(file_id);
+
+CREATE TABLE IF NOT EXISTS runs (
+    file_id INTEGER PRIMARY KEY REFERENCES files(id),
+    device TEXT NOT NULL,
+    start_ts INTEGER,
+    end_ts INTEGER,
+    samples INTEGER,
+    peak_tj REAL,
+    mean_tj REAL,
+    steady_power REAL,
+    peak_power REAL,
+    mean_fan REAL,
+    max_fan REAL,
+    stage_transition_ts INTEGER,
+    shutdown_ts INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_device ON runs(device, start_ts);
+"""
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _epoch(value):
+    # Logs carry naive local times; store them as if UTC so dates round-trip
+    if value is None or pd.isna(value):
+        return None
+    return int((pd.Timestamp(value) - pd.Timestamp(0)) // pd.Timedelta(seconds=1))
+
+def _stat(series, func):
+    series = series.dropna()
+    return float(func(series)) if len(series) else None
+
+def summarize_run(df):
+    """Per-run aggregates stored at ingest time"""
+    start = df['time'].min()
+    steady = df.loc[df['time'] >= start + pd.Timedelta(seconds=STEADY_STATE_AFTER_S), 'Power TOT']
+    if steady.dropna().empty:
+        steady = df['Power TOT']  # short run, never reached steady state
+    return {
+        'start_ts': _epoch(start),
+        'end_ts': _epoch(df['time'].max()),
+        'samples': len(df),
+        'peak_tj': _stat(df['Temp tj'], np.max),
+        'mean_tj': _stat(df['Temp tj'], np.mean),
+        'steady_power': _stat(steady, np.mean),
+        'peak_power': _stat(df['Power TOT'], np.max),
+        'mean_fan': _stat(df['Fan pwmfan0'], np.mean),
+        'max_fan': _stat(df['Fan pwmfan0'], np.max),
+        'stage_transition_ts': _epoch(df.attrs.get('stage_transition_time')),
+        'shutdown_ts': _epoch(df.attrs.get('shutdown_time')),
+    }
+
+def load_channels(csv_path):
+    """graph.load_log plus NaN padding for every channel we store"""
+    df = load_log(csv_path)
+    for channel in CHANNELS:
+        if channel not in df.columns:
+            df[channel] = np.nan
+        else:
+            df[channel] = pd.to_numeric(df[channel], errors='coerce')
+    return df.dropna(subset=['time'])
+
+def _delete_file(conn, file_id):
+    conn.execute("DELETE FROM samples WHERE file_id = ?", (file_id,))
+    conn.execute("DELETE FROM runs WHERE file_id = ?", (file_id,))
+    conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+def ingest_file(conn, csv_path, device):
+    """Load one CSV; returns 'skipped', 'empty', 'replaced' or 'added'"""
+    digest = file_hash(csv_path)
+    if conn.execute("SELECT 1 FROM files WHERE sha256 = ?", (digest,)).fetchone():
+        return 'skipped'
+
+    path = os.path.abspath(csv_path)
+    try:
+        df = load_channels(csv_path)
+    except (pd.errors.EmptyDataError, IndexError):
+        df = None  # empty file or header only
+
+    with conn:
+        previous = conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchall()
+        for (file_id,) in previous:
+            _delete_file(conn, file_id)
+
+        rows = 0 if df is None else len(df)
+        cur = conn.execute(
+            "INSERT INTO files (path, sha256, device, rows, ingested_at) VALUES (?, ?, ?, ?, ?)",
+            (path, digest, device, rows, time.time())
+        )
+        file_id = cur.lastrowid
+        if not rows:
+            return 'empty'
+
+        stage = df['stage'].astype('Int64') if 'stage' in df.columns else pd.Series(pd.NA, index=df.index)
+        columns = {
+            'file_id': file_id,
+            'device': device,
+            'date': df['time'].dt.strftime('%Y-%m-%d'),
+            'ts': (df['time'] - pd.Timestamp(0)) // pd.Timedelta(seconds=1),
+            'stage': stage.astype(object).where(stage.notna(), None),
+        }
+        for channel, col in CHANNELS.items():
+            columns[col] = df[channel].astype(object).where(df[channel].notna(), None)
+        frame = pd.DataFrame(columns)
+        names = list(frame.columns)
+        conn.executemany(
+            f"INSERT INTO samples ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+            frame.itertuples(index=False, name=None)
+        )
+
+        summary = summarize_run(df)
+        conn.execute(
+            f"INSERT INTO runs (file_id, device, {', '.join(summary)}) VALUES (?, ?, {', '.join('?' * len(summary))})",
+            (file_id, device, *summary.values())
+        )
+    return 'replaced' if previous else 'added'
+
+def device_for(csv_path):
+    """Device a CSV belongs to, from its run's run.json or its path"""
+    parent = os.path.dirname(os.path.abspath(csv_path))
+    if LAYOUT_DIR.match(os.path.basename(parent)):
+        try:
+            with open(os.path.join(os.path.dirname(parent), 'run.json')) as f:
+                hostname = json.load(f).get('hostname')
+            if hostname:
+                return hostname
+        except (OSError, ValueError):
+            pass
+    path = parent
+    while LAYOUT_DIR.match(os.path.basename(path)) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return os.path.basename(path) or parent
+
+def cmd_ingest(args):
+    paths = expand_inputs(args.paths)
+    if not paths:
+        print(f"No CSV files match: {' '.join(args.paths)}")
+        return 1
+
+    conn = connect(args.db)
+    counts = {}
+    start = time.perf_counter()
+    for csv_path in paths:
+        device = args.device or device_for(csv_path)
+        status = ingest_file(conn, csv_path, device)
+        counts[status] = counts.get(status, 0) + 1
+        if status != 'skipped':
+            print(f"{'✅' if status != 'empty' else '⚠️'} {status:<8} {device:<20} {csv_path}")
+    conn.close()
+    summary = ', '.join(f"{n} {status}" for status, n in sorted(counts.items()))
+    print(f"{len(paths)} files: {summary} in {time.perf_counter() - start:.2f}s -> {args.db}")
+    return 0
+
+def _query(args, sql, params=()):
+    if not os.path.exists(args.db):
+        print(f"No warehouse at {args.db}, run ingest first")
+        sys.exit(1)
+    conn = connect(args.db)
+    start = time.perf_counter()
+    cur = conn.execute(sql, params)
+    names = [d[0] for d in cur.description]
+    rows = cur.fetchall()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return names, rows, elapsed
+
+def _print_table(names, rows, elapsed, as_json):
+    if as_json:
+        print(json.dumps([dict(zip(names, row)) for row in rows], indent=2))
+        return
+    def fmt(value):
+        if value is None:
+            return '-'
+        return f"{value:.1f}" if isinstance(value, float) else str(value)
+    cells = [[fmt(v) for v in row] for row in rows]
+    widths = [max([len(n)] + [len(r[i]) for r in cells]) for i, n in enumerate(names)]
+    print('  '.join(n.rjust(w) for n, w in zip(names, widths)))
+    for row in cells:
+        print('  '.join(v.rjust(w) for v, w in zip(row, widths)))
+    print(f"({len(rows)} rows in {elapsed * 1000:.1f} ms)")
+
+def _device_filter(args, prefix='WHERE', table=None):
+    if args.device:
+        column = f"{table}.device" if table else "device"
+        return f" {prefix} {column} = ?", (args.device,)
+    return "", ()
+
+def cmd_units(args):
+    where, params = _device_filter(args)
+    names, rows, elapsed = _query(args, f"""
+        SELECT device, COUNT(*) AS runs, SUM(samples) AS samples,
+               MAX(peak_tj) AS peak_tj, AVG(mean_tj) AS mean_tj,
+               AVG(steady_power) AS steady_power_mw, MAX(peak_power) AS peak_power_mw,
+               AVG(mean_fan) AS mean_fan, MAX(max_fan) AS max_fan,
+               date(MIN(start_ts), 'unixepoch') AS first, date(MAX(end_ts), 'unixepoch') AS last
+        FROM runs{where} GROUP BY device ORDER BY peak_tj DESC
+    """, params)
+    _print_table(names, rows, elapsed, args.json)
+
+def cmd_runs(args):
+    where, params = _device_filter(args, 'AND', 'runs')
+    names, rows, elapsed = _query(args, f"""
+        SELECT runs.device, datetime(start_ts, 'unixepoch') AS start,
+               ROUND((end_ts - start_ts) / 3600.0, 2) AS hours, samples,
+               peak_tj, mean_tj, steady_power AS steady_power_mw, max_fan,
+               files.path AS source
+        FROM runs JOIN files ON files.id = runs.file_id
+        WHERE 1 = 1{where} ORDER BY start_ts
+    """, params)
+    _print_table(names, rows, elapsed, args.json)
+
+def cmd_fan_curve(args):
+    where, params = _device_filter(args, 'AND')
+    names, rows, elapsed = _query(args, f"""
+        SELECT device, CAST(temp_tj / ? AS INTEGER) * ? AS tj_bucket,
+               COUNT(*) AS samples, AVG(fan) AS mean_fan, MIN(fan) AS min_fan, MAX(fan) AS max_fan
+        FROM samples
+        WHERE temp_tj IS NOT NULL AND fan IS NOT NULL{where}
+        GROUP BY device, tj_bucket ORDER BY device, tj_bucket
+    """, (args.bucket, args.bucket, *params))
+    _print_table(names, rows, elapsed, args.json)
+
+def main():
+    parser = argparse.ArgumentParser(description='Fleet burn-log warehouse (SQLite)')
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'Warehouse file (default: {DEFAULT_DB})')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    ingest = sub.add_parser('ingest', help='Load new or changed burn logs')
+    ingest.add_argument('paths', nargs='+', help='CSV files or globs')
+    ingest.add_argument('--device', help='Device name for every file (default: from run.json or the path)')
+
+    for name, help_text in (('units', 'Per-unit aggregates'), ('runs', 'One row per ingested log'),
+                            ('fan-curve', 'Mean fan PWM per junction temperature bucket')):
+        query = sub.add_parser(name, help=help_text)
+        query.add_argument('--device', help='Only this device')
+        query.add_argument('--json', action='store_true', help='Print JSON instead of a table')
+        if name == 'fan-curve':
+            query.add_argument('--bucket', type=float, default=5.0, help='Temperature bucket in °C (default: 5)')
+
+    args = parser.parse_args()
+    commands = {'ingest': cmd_ingest, 'units': cmd_units, 'runs': cmd_runs, 'fan-curve': cmd_fan_curve}
+    sys.exit(commands[args.command](args) or 0)
+
+if __name__ == "__main__":
+    main()